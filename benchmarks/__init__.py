@@ -0,0 +1 @@
+# Synthetic data and timing harness for the dashboard's hot paths
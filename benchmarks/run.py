@@ -0,0 +1,232 @@
+"""Time every hot path of the dashboard pages on synthetic snapshots.
+
+    python -m benchmarks.run --sizes 1000 100000 1000000 --output results.json
+
+Each stage is timed (best of --repeat runs) and then run once more under
+tracemalloc for its peak memory. pyarrow's memory pool is invisible to
+tracemalloc, so its peak over the same run is sampled alongside. Results are
+written as JSON so runs can be compared with each other.
+"""
+import argparse
+import contextlib
+import gc
+import io
+import itertools
+import json
+import os
+import platform
+import tempfile
+import threading
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+from bokeh.embed import json_item
+
+from benchmarks.synthetic import snapshot_csv, write_snapshots
+from industry_groups.arrow_frames import take_rows
+from industry_groups.charts import last_week_chart, rank_bar_chart
+from industry_groups.compact import compact_history
+from industry_groups.filters import FilterIndex, HistoryIndex
+from industry_groups.history_store import HistoryStore
+from industry_groups.ingestion import clean_snapshot, snapshot_date, stream_snapshot
+from industry_groups.ranking import improving_groups, rank_difference
+
+# Row counts benchmarked when --sizes is not given
+DEFAULT_SIZES = [1000, 100000, 1000000]
+
+# Seconds between two samples of the bytes allocated by pyarrow
+ARROW_SAMPLE_INTERVAL = 0.0005
+
+
+@contextlib.contextmanager
+def arrow_peak():
+    """Yield a dict holding, once the block is done, the peak bytes pyarrow allocated above its starting point.
+
+    The pool has no resettable high-water mark, so pa.total_allocated_bytes() is
+    sampled from a thread; Arrow kernels release the GIL, short spikes between
+    two samples can still be missed.
+    """
+    start = pa.total_allocated_bytes()
+    highest = [start]
+    done = threading.Event()
+
+    def sample():
+        while not done.wait(ARROW_SAMPLE_INTERVAL):
+            highest[0] = max(highest[0], pa.total_allocated_bytes())
+
+    sampler = threading.Thread(target=sample, daemon=True)
+    sampler.start()
+    peak = {}
+    try:
+        yield peak
+    finally:
+        done.set()
+        sampler.join()
+        peak['bytes'] = max(highest[0], pa.total_allocated_bytes()) - start
+
+
+class Benchmark:
+    def __init__(self, repeat):
+        self.repeat = repeat
+        self.results = []
+
+    def measure(self, page, rows, stage, func, *args):
+        """Record the best time, the peak traced memory and the Arrow peak of `func(*args)`; returns its result."""
+        seconds = []
+        for _ in range(self.repeat):
+            gc.collect()
+            start = time.perf_counter()
+            func(*args)
+            seconds.append(time.perf_counter() - start)
+
+        gc.collect()
+        tracemalloc.start()
+        with arrow_peak() as arrow:
+            value = func(*args)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        self.results.append({'page': page, 'rows': rows, 'stage': stage, 'seconds': min(seconds),
+                             'peak_mb': peak / 2 ** 20, 'arrow_peak_mb': arrow['bytes'] / 2 ** 20})
+        print(f"{page:<30} {rows:>9} {stage:<24} {min(seconds):>9.4f}s {peak / 2 ** 20:>9.1f} MB"
+              f" {arrow['bytes'] / 2 ** 20:>9.1f} MB arrow")
+        return value
+
+
+def build_and_serialize(chart, df):
+    # What a page pays before the chart reaches the browser
+    return json.dumps(json_item(chart(df)))
+
+
+def grid_payload(df):
+    # AgGrid ships the rows as records JSON
+    return df.to_json(orient='records', date_format='iso')
+
+
+def arrow_payload(df):
+    # st.dataframe ships the frame as an Arrow IPC stream
+    sink = io.BytesIO()
+    table = pa.Table.from_pandas(df)
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue()
+
+
+def arrow_table_payload(table):
+    # The same stream written straight from an Arrow table
+    sink = io.BytesIO()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue()
+
+
+def bench_snapshot_pages(bench, rows, max_render_rows):
+    data = snapshot_csv(rows)
+    raw = bench.measure("Dashboard", rows, "read_csv", lambda: pd.read_csv(io.BytesIO(data), index_col=False))
+    bench.measure("Dashboard", rows, "clean", lambda: clean_snapshot(raw.copy()))
+    # Uploads are streamed with their symbols, as the background ingest jobs do
+    snapshot, _ = bench.measure("Dashboard", rows, "ingest",
+                                lambda: stream_snapshot(io.BytesIO(data), with_symbols=True))
+    index = bench.measure("Dashboard", rows, "filter_index", FilterIndex, snapshot)
+
+    # A typical selection: the upper half of market caps and twenty groups
+    min_market_cap = float(snapshot['MarketCapital'].median())
+    groups = list(snapshot['IndustryGroupName'].sample(min(20, rows), random_state=0))
+    bench.measure("Dashboard", rows, "filter", index.query, snapshot, min_market_cap, None, groups)
+    bench.measure("Dashboard", rows, "stream", lambda: stream_snapshot(io.BytesIO(data), min_market_cap))
+
+    # Show All Data renders every group, capped so the largest sizes stay runnable
+    shown = index.query(snapshot, min_market_cap).head(max_render_rows)
+    bench.measure("Dashboard", len(shown), "figure", build_and_serialize, rank_bar_chart, shown)
+    bench.measure("Dashboard", len(shown), "grid", grid_payload, shown)
+
+    comparison = bench.measure("Ranking Comparison", rows, "filter",
+                               lambda: improving_groups(index.query(snapshot, min_market_cap)))
+    comparison = comparison.head(max_render_rows)
+    bench.measure("Ranking Comparison", len(comparison), "figure", build_and_serialize, rank_bar_chart, comparison)
+    bench.measure("Ranking Comparison", len(comparison), "grid", grid_payload, comparison)
+
+    difference = bench.measure("Current vs. Last Week Ranking", rows, "filter",
+                               lambda: rank_difference(index.query(snapshot, min_market_cap)))
+    difference = difference.head(max_render_rows)
+    bench.measure("Current vs. Last Week Ranking", len(difference), "figure", build_and_serialize,
+                  last_week_chart, difference)
+    bench.measure("Current vs. Last Week Ranking", len(difference), "grid", grid_payload, difference)
+
+
+def bench_historical_page(bench, rows, days, max_render_rows):
+    # `rows` is the size of the whole history, spread over `days` snapshots
+    rows_per_day = max(rows // days, 1)
+    with tempfile.TemporaryDirectory() as snapshot_dir, tempfile.TemporaryDirectory() as store_dir:
+        paths = write_snapshots(snapshot_dir, rows_per_day, days)
+        files = [(path, open(path, 'rb').read()) for path in paths]
+
+        def ingest():
+            parsed = {snapshot_date(path): stream_snapshot(io.BytesIO(data), with_symbols=True)
+                      for path, data in files}
+            frames = [df.assign(Date=date) for date, (df, _) in parsed.items()]
+            return pd.concat(frames, ignore_index=True), {date: symbols for date, (_, symbols) in parsed.items()}
+
+        history, symbols = bench.measure("Historical View", rows, "ingest", ingest)
+        # Every timed append writes into a fresh store
+        attempts = itertools.count()
+        bench.measure("Historical View", rows, "store_append",
+                      lambda: HistoryStore(os.path.join(store_dir, str(next(attempts)))).append(history, symbols))
+        store = HistoryStore(os.path.join(store_dir, "0"))
+        history = bench.measure("Historical View", rows, "store_load", store.load)
+        index = bench.measure("Historical View", rows, "history_index", lambda: HistoryIndex(compact_history(history)))
+
+        # A date range covering the later half of the snapshots, the middle market caps and twenty groups
+        start, end = index.dates[len(index.dates) // 2], index.dates[-1]
+        low, high = np.nanpercentile(index.market_cap, [25, 75])
+        groups = list(index.categories[:20])
+        selected = bench.measure("Historical View", rows, "filter",
+                                 lambda: index.market_cap_rows(start, end, low, high, groups))
+        bench.measure("Historical View", len(selected), "within", index.within, selected, start, end)
+
+        # The page shows its rows newest first, reversing the rows of the index instead of sorting
+        shown = index.market_cap_rows(start, end, low, high)[-max_render_rows:]
+        view = bench.measure("Historical View", len(shown), "view", lambda: index.df.iloc[shown[::-1]])
+        bench.measure("Historical View", len(shown), "dataframe", arrow_payload, view)
+
+        # The same view from the Arrow copy of the indexed history
+        table = pa.Table.from_pandas(index.df, preserve_index=False)
+        bench.measure("Historical View", len(shown), "dataframe_arrow",
+                      lambda: arrow_table_payload(take_rows(table, shown[::-1])))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the dashboard pages on synthetic snapshots.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="rows per snapshot")
+    parser.add_argument("--days", type=int, default=30, help="snapshots making up the Historical View history")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per stage, the best one is kept")
+    parser.add_argument("--max-render-rows", type=int, default=100000,
+                        help="rows handed to chart and grid stages")
+    parser.add_argument("--output", default="benchmark_results.json", help="JSON file receiving the results")
+    args = parser.parse_args(argv)
+
+    bench = Benchmark(args.repeat)
+    for rows in args.sizes:
+        bench_snapshot_pages(bench, rows, args.max_render_rows)
+        bench_historical_page(bench, rows, args.days, args.max_render_rows)
+
+    report = {
+        'created': datetime.now(timezone.utc).isoformat(),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'arguments': vars(args),
+        'results': bench.results,
+    }
+    with open(args.output, 'w', encoding='utf-8') as file:
+        json.dump(report, file, indent=2)
+    print(f"Wrote {len(bench.results)} measurements to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""Synthetic snapshots with the same schema and formatting as the real daily exports.
+
+    python -m benchmarks.synthetic OUTPUT_DIR --rows 100000 --days 30
+"""
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+# Column order of the real exports
+COLUMNS = ['Sno', 'Symbol', 'IndustryGroupName', 'NumberOfStocks', 'IndustryGroupRankCurrent',
+           'IndustryGroupRankLastWeek', 'IndustryGroupRankLast3MonthAgo', 'IndustryGroupRankLast6MonthAgo',
+           'MarketCapital', 'PricePercentChangeYTD']
+
+
+def _drift(rng, ranks, step, rows):
+    # Earlier ranks are the current ranks moved by a bounded random step
+    return np.clip(ranks + rng.integers(-step, step + 1, rows), 1, rows)
+
+
+def snapshot_frame(rows, seed=0):
+    """One snapshot of `rows` industry groups as the raw, uncleaned frame."""
+    rng = np.random.default_rng(seed)
+    current = rng.permutation(rows) + 1
+    market_cap = np.round(rng.lognormal(mean=9, sigma=2, size=rows), 2)
+    return pd.DataFrame({
+        'Sno': np.arange(1, rows + 1),
+        'Symbol': [f"SYM{i}" for i in range(rows)],
+        'IndustryGroupName': [f"Industry Group {i:07d}" for i in range(rows)],
+        'NumberOfStocks': rng.integers(1, 120, rows),
+        'IndustryGroupRankCurrent': current,
+        'IndustryGroupRankLastWeek': _drift(rng, current, 10, rows),
+        'IndustryGroupRankLast3MonthAgo': _drift(rng, current, 50, rows),
+        'IndustryGroupRankLast6MonthAgo': _drift(rng, current, 100, rows),
+        'MarketCapital': [f"{value:,.2f} Cr" for value in market_cap],
+        'PricePercentChangeYTD': np.round(rng.normal(5, 20, rows), 2),
+    }, columns=COLUMNS)
+
+
+def snapshot_csv(rows, seed=0):
+    """CSV bytes of one synthetic snapshot, as an analyst would upload it."""
+    return snapshot_frame(rows, seed).to_csv(index=False).encode()
+
+
+def write_snapshots(output_dir, rows, days, start="2023-01-02", seed=0):
+    """Write `days` consecutive dd-mm-YYYY.csv snapshots; returns their paths."""
+    os.makedirs(output_dir, exist_ok=True)
+    paths = []
+    for day, date in enumerate(pd.date_range(start, periods=days, freq='D')):
+        path = os.path.join(output_dir, f"{date:%d-%m-%Y}.csv")
+        with open(path, 'wb') as file:
+            file.write(snapshot_csv(rows, seed + day))
+        paths.append(path)
+    return paths
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Write synthetic dd-mm-YYYY.csv snapshots.")
+    parser.add_argument("output_dir")
+    parser.add_argument("--rows", type=int, default=1000, help="industry groups per snapshot")
+    parser.add_argument("--days", type=int, default=1, help="number of daily snapshots")
+    parser.add_argument("--start", default="2023-01-02", help="date of the first snapshot")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+    paths = write_snapshots(args.output_dir, args.rows, args.days, args.start, args.seed)
+    print(f"Wrote {len(paths)} snapshots to {args.output_dir}")
+
+
+if __name__ == "__main__":
+    main()
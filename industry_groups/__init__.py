@@ -0,0 +1 @@
+# Shared building blocks for the Industry Group dashboard pages
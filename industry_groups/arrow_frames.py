@@ -0,0 +1,42 @@
+"""Arrow tables from the history store all the way to st.dataframe.
+
+Set INDUSTRY_GROUPS_ARROW_FRAMES=1 to build the Historical View table from a
+pyarrow.Table of the compacted history instead of a pandas frame. The history
+index then keeps its group names as Arrow strings, so the table shares every
+buffer of the indexed frame rather than holding a second copy. Views are an
+Arrow take of the selected rows, newest first, and they reach the browser
+without a pandas to Arrow conversion.
+"""
+import hashlib
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+ARROW_FRAMES = os.environ.get("INDUSTRY_GROUPS_ARROW_FRAMES", "") not in ("", "0")
+
+
+def arrow_categories(df):
+    """`df` with the string categories of its categorical columns stored as Arrow strings.
+
+    Numbers, masks and category codes already become Arrow buffers without a
+    copy, only categories held as Python strings are converted. With these the
+    Arrow table of the frame shares all of its memory.
+    """
+    df = df.copy(deep=False)
+    for column in df.columns:
+        values = df[column]
+        if isinstance(values.dtype, pd.CategoricalDtype) and values.cat.categories.dtype == object:
+            df[column] = values.cat.rename_categories(values.cat.categories.astype('string[pyarrow]'))
+    return df
+
+
+def take_rows(table, rows):
+    """Rows of `table` at the positions `rows`, in that order."""
+    return table.take(pa.array(np.ascontiguousarray(rows, dtype=np.int64)))
+
+
+def rows_key(rows):
+    # Identifies a selection of rows, so an unchanged view is recognized whatever filters produced it
+    return hashlib.blake2b(np.ascontiguousarray(rows, dtype=np.int64).tobytes(), digest_size=16).hexdigest()
@@ -0,0 +1,88 @@
+"""Run the dashboard's ranking computations over a folder of daily snapshots.
+
+    python -m industry_groups.batch SNAPSHOT_DIR OUTPUT_DIR [--format csv] [--min-market-cap 500]
+
+Every dd-mm-YYYY.csv in SNAPSHOT_DIR gets a folder of the same name in
+OUTPUT_DIR holding the Ranking Comparison and Current vs. Last Week tables and
+their charts as standalone HTML. Snapshots already processed are skipped
+unless --force is given.
+"""
+import argparse
+import glob
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from bokeh.embed import file_html
+from bokeh.resources import CDN
+
+from industry_groups.charts import last_week_chart, rank_bar_chart
+from industry_groups.ingestion import snapshot_date, stream_snapshot
+from industry_groups.ranking import improving_groups, rank_difference
+
+# Output name, table computation and chart of every page run in batch
+REPORTS = {
+    'ranking_comparison': (improving_groups, rank_bar_chart),
+    'current_vs_last_week': (rank_difference, last_week_chart),
+}
+
+
+def snapshot_files(snapshot_dir):
+    # Only files named after their date are snapshots
+    files = []
+    for path in glob.glob(os.path.join(snapshot_dir, "*.csv")):
+        try:
+            files.append((snapshot_date(path), path))
+        except ValueError:
+            continue
+    return [path for _, path in sorted(files)]
+
+
+def process_snapshot(path, output_dir, output_format="parquet", min_market_cap=None, force=False):
+    """Write every report for one snapshot; returns the number of reports written."""
+    report_dir = os.path.join(output_dir, os.path.splitext(os.path.basename(path))[0])
+    outputs = [os.path.join(report_dir, f"{name}.{output_format}") for name in REPORTS]
+    if not force and all(os.path.exists(output) for output in outputs):
+        return 0
+
+    # Rows below the market cap floor are dropped chunk by chunk, never holding the whole file
+    snapshot = stream_snapshot(path, min_market_cap)
+
+    os.makedirs(report_dir, exist_ok=True)
+    for (name, (compute, chart)), output in zip(REPORTS.items(), outputs):
+        table = compute(snapshot)
+        if output_format == "csv":
+            table.to_csv(output, index=False)
+        else:
+            table.to_parquet(output, index=False)
+
+        with open(os.path.join(report_dir, f"{name}.html"), 'w', encoding='utf-8') as file:
+            file.write(file_html(chart(table), CDN, title=name))
+    return len(REPORTS)
+
+
+def run(snapshot_dir, output_dir, output_format="parquet", min_market_cap=None, force=False, workers=None):
+    """Process every snapshot in `snapshot_dir` on a process pool; returns {snapshot path: reports written}."""
+    files = snapshot_files(snapshot_dir)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        written = executor.map(process_snapshot, files, [output_dir] * len(files), [output_format] * len(files),
+                               [min_market_cap] * len(files), [force] * len(files))
+        return dict(zip(files, written))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the ranking computations over a folder of daily snapshots.")
+    parser.add_argument("snapshot_dir", help="folder holding dd-mm-YYYY.csv snapshots")
+    parser.add_argument("output_dir", help="folder receiving one report folder per snapshot")
+    parser.add_argument("--format", choices=["parquet", "csv"], default="parquet", help="table format")
+    parser.add_argument("--min-market-cap", type=float, default=None, help="drop groups below this market cap")
+    parser.add_argument("--workers", type=int, default=None, help="number of worker processes")
+    parser.add_argument("--force", action="store_true", help="recompute snapshots already processed")
+    args = parser.parse_args(argv)
+
+    written = run(args.snapshot_dir, args.output_dir, args.format, args.min_market_cap, args.force, args.workers)
+    processed = sum(1 for count in written.values() if count)
+    print(f"Processed {processed} of {len(written)} snapshots into {args.output_dir}")
+
+
+if __name__ == "__main__":
+    main()
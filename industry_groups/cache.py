@@ -0,0 +1,111 @@
+import logging
+import threading
+from collections import OrderedDict
+
+_MISSING = object()
+
+LOGGER = logging.getLogger(__name__)
+
+# Values larger than the whole budget kept outside of it at most, enough for the frame, symbols and index of a file
+MAX_OVERSIZED = 3
+
+
+class LRUCache:
+    """Least recently used mapping bounded by the total size of its values.
+
+    Sizes are supplied by the caller on `put`, so the same class can budget
+    serialized charts by length and frames by their memory usage. Values larger
+    than the whole budget are kept outside of it, the MAX_OVERSIZED most recent
+    ones, so the largest files are not parsed again on every rerun.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._oversized = OrderedDict()
+        self._loading = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return default
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return self._entries[key][0]
+
+    def put(self, key, value, size):
+        with self._lock:
+            if key in self._entries:
+                _, old_size = self._entries.pop(key)
+                if key in self._oversized:
+                    del self._oversized[key]
+                else:
+                    self.total_bytes -= old_size
+
+            # A value larger than the whole budget would only evict everything else, it goes outside of it
+            if size > self.max_bytes:
+                LOGGER.warning("%.0f MB entry exceeds the %.0f MB cache budget, kept outside of it",
+                               size / 2 ** 20, self.max_bytes / 2 ** 20)
+                if len(self._oversized) >= MAX_OVERSIZED:
+                    del self._entries[self._oversized.popitem(last=False)[0]]
+                self._oversized[key] = None
+                self._entries[key] = (value, size)
+                return
+
+            self._entries[key] = (value, size)
+            self.total_bytes += size
+            while self.total_bytes > self.max_bytes:
+                evicted = next(entry for entry in self._entries if entry not in self._oversized)
+                self.total_bytes -= self._entries.pop(evicted)[1]
+
+    def get_or_create(self, key, create, size_of):
+        """Return the value for `key`, calling `create()` on a miss and caching it with `size_of(value)` bytes.
+
+        Threads missing the same key together wait for a single `create()` instead
+        of each running their own.
+        """
+        value = self.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+
+        with self._lock:
+            loading = self._loading.setdefault(key, threading.Lock())
+        try:
+            with loading:
+                with self._lock:
+                    if key in self._entries:
+                        # Created by the thread this one waited for, which makes it a hit after all
+                        self.misses -= 1
+                        self.hits += 1
+                        self._entries.move_to_end(key)
+                        return self._entries[key][0]
+                value = create()
+                self.put(key, value, size_of(value))
+                return value
+        finally:
+            with self._lock:
+                if self._loading.get(key) is loading:
+                    del self._loading[key]
+
+    def stats(self):
+        # Counters shown in the Performance panel
+        oversized = sum(self._entries[key][1] for key in self._oversized)
+        return {'entries': len(self._entries), 'mb': (self.total_bytes + oversized) / 2 ** 20,
+                'max_mb': self.max_bytes / 2 ** 20, 'hits': self.hits, 'misses': self.misses}
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._oversized.clear()
+            self.total_bytes = 0
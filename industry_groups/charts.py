@@ -0,0 +1,134 @@
+import numpy as np
+import pandas as pd
+from bokeh.models import (ColumnDataSource, CustomJSHover, FixedTicker, HoverTool, Legend, LegendItem,
+                          NumeralTickFormatter, Range1d)
+from bokeh.plotting import figure
+from bokeh.transform import linear_cmap
+
+# Legend label and color of every rank series, in the order the bars are drawn
+RANK_SERIES = {
+    'IndustryGroupRankLast3MonthAgo': ("Last 3 Months Rank", "#feb41f"),
+    'IndustryGroupRankLastWeek': ("Last Week Rank", "#FF5733"),
+    'IndustryGroupRankCurrent': ("Current Rank", "#3377FF"),
+}
+
+# Share of the space between two groups taken by their bars
+BAR_GROUP_WIDTH = 0.8
+
+# Text labels are only drawn while the chart has at most this many industry groups
+LABEL_GROUP_LIMIT = 40
+
+
+def series_labels(columns, labels=None):
+    # Legend label of every column, `labels` overrides the default names of RANK_SERIES
+    return [(labels or {}).get(column, RANK_SERIES[column][0]) for column in columns]
+
+
+def rank_long_format(df, columns):
+    """Return (columns, bar width) with one bar per (industry group, rank series) pair, built from whole columns.
+
+    Bars are placed on a numeric axis: group i is centered on x = i and its series
+    sit side by side around it, so the nearest integer to x is the group. Every
+    column is a small number array, which Bokeh sends binary-encoded; the group
+    names are sent once with the axis instead of once per bar.
+    """
+    groups = len(df)
+    width = BAR_GROUP_WIDTH / len(columns)
+    offsets = (np.arange(len(columns)) - (len(columns) - 1) / 2) * width
+    ranks = np.column_stack([pd.to_numeric(df[column], errors='coerce').to_numpy(dtype=float, na_value=np.nan)
+                             for column in columns]).ravel()
+    return {
+        'x': (np.arange(groups, dtype=float)[:, None] + offsets).ravel().astype(np.float32),
+        'Series': np.tile(np.arange(len(columns), dtype=np.uint8), groups),
+        'Rank': ranks.astype(np.float32),
+    }, width
+
+
+def rank_bar_chart(df, columns=tuple(RANK_SERIES), show_labels=True, y_range=None, labels=None):
+    """Grouped bar chart of the given rank columns for every industry group in `df`.
+
+    All series share one numeric source and a single vbar glyph colored by series
+    code, so the payload grows with a few numbers per bar and one name per group.
+    `labels` maps columns to legend labels other than the RANK_SERIES ones.
+    """
+    colors = [RANK_SERIES[column][1] for column in columns]
+    data, bar_width = rank_long_format(df, columns)
+    source = ColumnDataSource(data)
+    labels = series_labels(columns, labels)
+    groups = df['IndustryGroupName'].astype(str).tolist()
+
+    options = {} if y_range is None else {'y_range': y_range}
+    p = figure(x_range=Range1d(-0.6, max(len(groups), 1) - 0.4), height=400, title="Industry Group Rankings",
+               toolbar_location="above", tools="pan,box_zoom,reset,save", output_backend="webgl", **options)
+
+    color = linear_cmap('Series', palette=colors, low=0, high=max(len(colors) - 1, 1))
+    bars = p.vbar(x='x', top='Rank', width=bar_width * 0.95, source=source, fill_color=color, line_color=color)
+
+    # Labels are decimated away once they would overlap anyway
+    if show_labels and len(groups) <= LABEL_GROUP_LIMIT:
+        p.text(x='x', y='Rank', text='Rank', text_align='center', text_baseline='bottom', source=source,
+               y_offset=2, text_color="black", text_font_size="8pt")
+
+    p.xgrid.grid_line_color = None
+
+    # Add hover tooltips, names are looked up in the browser: the group from the axis labels, the series by code
+    group_name = CustomJSHover(args={'axis': p.xaxis[0]},
+                               code="return axis.major_label_overrides[Math.round(value)]")
+    series_name = CustomJSHover(args={'names': ColumnDataSource({'name': labels})},
+                                code="return names.data.name[value]")
+    hover = HoverTool(renderers=[bars], formatters={'@x': group_name, '@Series': series_name})
+    hover.tooltips = [("Industry Group", "@x{custom}"),
+                      ("Series", "@Series{custom}"),
+                      ("Rank", "@Rank{0}")]
+    p.add_tools(hover)
+
+    # One legend entry per series, below the chart, each pointing at the series' first bar
+    if groups:
+        legend = Legend(items=[LegendItem(label=label, renderers=[bars], index=position)
+                               for position, label in enumerate(labels)], location="center",
+                        orientation="horizontal")
+        p.add_layout(legend, 'below')
+
+    # Format y-axis as integers
+    p.yaxis[0].formatter = NumeralTickFormatter(format="0")
+
+    # One tick per group carrying its name, shown vertically
+    p.xaxis.ticker = FixedTicker(ticks=list(range(len(groups))))
+    p.xaxis.major_label_overrides = dict(enumerate(groups))
+    p.xaxis.major_label_orientation = "vertical"
+    return p
+
+
+def rank_trajectory_chart(data, width):
+    """Current rank of every industry group over time, `width` pixels wide.
+
+    Every line comes from one row of a single columnar source (built by
+    trajectories.trajectories) and is drawn by one multi_line glyph, so hundreds of
+    groups cost one renderer. Lower ranks are better, so the y axis is flipped.
+    """
+    source = ColumnDataSource(data)
+    p = figure(width=width, height=450, x_axis_type="datetime", title="Industry Group Rank Trajectories",
+               toolbar_location="above", tools="pan,box_zoom,wheel_zoom,reset,save", output_backend="webgl")
+
+    lines = p.multi_line(xs='xs', ys='ys', source=source, line_color='color', line_width=1.5, line_alpha=0.7,
+                         hover_line_color='color', hover_line_width=3, hover_line_alpha=1.0)
+
+    # Add hover tooltips
+    hover = HoverTool(renderers=[lines], formatters={'$x': 'datetime'})
+    hover.tooltips = [("Industry Group", "@IndustryGroupName"),
+                      ("Date", "$x{%d-%m-%Y}"),
+                      ("Rank", "$y{0}")]
+    p.add_tools(hover)
+
+    p.y_range.flipped = True
+    p.yaxis[0].formatter = NumeralTickFormatter(format="0")
+    p.yaxis.axis_label = "Rank"
+    return p
+
+
+def last_week_chart(df, show_labels=True, labels=None):
+    """Current vs. last week rank bars, with room above the tallest bar for its label."""
+    y_max = max(df['IndustryGroupRankCurrent'].max(), df['IndustryGroupRankLastWeek'].max())
+    y_range = (0, y_max + 5) if pd.notna(y_max) else None
+    return rank_bar_chart(df, ['IndustryGroupRankLastWeek', 'IndustryGroupRankCurrent'], show_labels,
+                          y_range=y_range, labels=labels)
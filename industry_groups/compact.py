@@ -0,0 +1,36 @@
+import numpy as np
+import pandas as pd
+
+from industry_groups.datasets import frame_memory
+from industry_groups.ingestion import RANK_COLUMNS
+
+# Whole-number columns stored in the smallest nullable integer type that fits
+INTEGER_COLUMNS = ['NumberOfStocks'] + RANK_COLUMNS
+
+
+def _nullable_int(values):
+    values = pd.to_numeric(values, errors='coerce')
+    largest = np.nanmax(np.abs(values.to_numpy(dtype=float, na_value=np.nan))) if len(values) else 0
+    return values.astype('Int16' if not largest > np.iinfo(np.int16).max else 'Int32')
+
+
+def compact_history(df):
+    """Return `df` with a compact schema for the concatenated history.
+
+    Group names become one categorical shared by every snapshot, ranks become
+    nullable 16-bit integers (32-bit when a universe is larger), MarketCapital is
+    stored as float32 and Date as an ordered dictionary of the snapshot dates.
+    The size of the wide frame is kept in `attrs['memory_before']`.
+    """
+    compacted = df.copy(deep=False)
+    compacted['IndustryGroupName'] = compacted['IndustryGroupName'].astype('category')
+    for column in INTEGER_COLUMNS:
+        if column in compacted.columns:
+            compacted[column] = _nullable_int(compacted[column])
+    compacted['MarketCapital'] = compacted['MarketCapital'].astype('float32')
+    if 'Date' in compacted.columns:
+        compacted['Date'] = pd.Categorical(compacted['Date'], categories=np.sort(compacted['Date'].unique()),
+                                           ordered=True)
+
+    compacted.attrs['memory_before'] = frame_memory(df)
+    return compacted
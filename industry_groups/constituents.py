@@ -0,0 +1,136 @@
+"""Symbols behind every industry group of a snapshot, for drilling into a group.
+
+Ingestion reads the Symbol column along with the group columns and keeps the
+symbol rows in a small columnar table sorted by industry group. An array of
+offsets gives the block of every group, so the constituents of one group are a
+slice of that table and nothing is scanned when a group is opened. Snapshots in
+the history store keep their table as an Arrow IPC file in the _symbols folder
+(pyarrow skips folders starting with "_" when it reads the snapshots), which is
+only memory-mapped once a group of that snapshot is drilled into.
+"""
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import streamlit as st
+
+from industry_groups.instrumentation import span
+
+# Symbol level columns of a snapshot, read along with the group columns
+SYMBOL_COLUMNS = ['Symbol', 'MarketCapital', 'PricePercentChangeYTD']
+
+# Folder of the symbol tables inside the history store
+SYMBOL_DIR = "_symbols"
+
+# Schema metadata keys of a stored symbol table
+GROUPS_KEY = b'groups'
+OFFSETS_KEY = b'offsets'
+
+
+class SymbolIndex:
+    """Inverted index from industry group name to its rows in a columnar table of symbols."""
+
+    def __init__(self, groups, offsets, table):
+        self.groups = pd.Index(groups)
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.table = table
+
+    def memory(self):
+        return self.table.nbytes + self.offsets.nbytes + self.groups.memory_usage(deep=True)
+
+    def _position(self, group):
+        # Block of `group` in the offsets, -1 for a group the snapshot does not have
+        return self.groups.get_indexer([group])[0]
+
+    def count(self, group):
+        position = self._position(group)
+        return 0 if position < 0 else int(self.offsets[position + 1] - self.offsets[position])
+
+    def constituents(self, group):
+        """Frame of the symbols of `group`, largest market cap first; empty for an unknown group."""
+        position = self._position(group)
+        if position < 0:
+            return self.table.slice(0, 0).to_pandas()
+        start, stop = self.offsets[position], self.offsets[position + 1]
+        frame = self.table.slice(start, stop - start).to_pandas()
+        if 'MarketCapital' in frame.columns:
+            frame = frame.sort_values('MarketCapital', ascending=False, kind='stable', ignore_index=True)
+        return frame
+
+    def write(self, path):
+        # The offsets travel in the schema metadata, written to a temporary file first like the snapshots
+        table = self.table.replace_schema_metadata({GROUPS_KEY: json.dumps(self.groups.tolist()),
+                                                    OFFSETS_KEY: json.dumps(self.offsets.tolist())})
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with pa.OSFile(path + ".tmp", 'wb') as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        os.replace(path + ".tmp", path)
+
+
+def build_symbol_index(df):
+    """SymbolIndex of a snapshot frame holding IndustryGroupName and the SYMBOL_COLUMNS it has.
+
+    MarketCapital must already be decoded; prices and market caps are kept as
+    float32 like the compacted history.
+    """
+    with span("symbol_index"):
+        # Groups are numbered in order of appearance, sorting the names is not needed
+        codes, groups = pd.factorize(df['IndustryGroupName'])
+        order = np.argsort(codes, kind='stable')
+        order = order[codes[order] >= 0]
+        offsets = np.concatenate([[0], np.cumsum(np.bincount(codes[order], minlength=len(groups)))])
+
+        columns = {}
+        for column in SYMBOL_COLUMNS:
+            if column not in df.columns:
+                continue
+            values = df[column].iloc[order]
+            if column == 'Symbol':
+                columns[column] = pa.array(values.astype(str).to_numpy(), type=pa.string())
+            else:
+                values = pd.to_numeric(values, errors='coerce').to_numpy(dtype='float32', na_value=np.nan)
+                columns[column] = pa.array(values, from_pandas=True)
+        return SymbolIndex(groups.astype(str), offsets, pa.table(columns))
+
+
+def symbol_path(root, date):
+    return os.path.join(root, SYMBOL_DIR, f"{pd.Timestamp(date):%Y-%m-%d}.arrow")
+
+
+def read_symbol_index(path):
+    # Memory-mapped, so only the pages of the groups looked at are read from disk
+    table = pa.ipc.open_file(pa.memory_map(path)).read_all()
+    metadata = table.schema.metadata
+    return SymbolIndex(json.loads(metadata[GROUPS_KEY]), json.loads(metadata[OFFSETS_KEY]),
+                       table.replace_schema_metadata(None))
+
+
+@st.cache_resource(show_spinner=False, max_entries=32)
+def history_symbols(root, date):
+    # Symbol tables are written once with their snapshot, so the date identifies them; None for older snapshots
+    path = symbol_path(root, date)
+    return read_symbol_index(path) if os.path.exists(path) else None
+
+
+def show_constituents(symbols, group):
+    """Table of the symbols of `group`, or a note when the snapshot was stored without them."""
+    if symbols is None:
+        st.caption("No symbols are stored for this snapshot.")
+        return
+    with span("constituents"):
+        frame = symbols.constituents(group)
+    st.subheader(f"Constituents of {group}")
+    st.caption(f"{len(frame):,} symbols")
+    st.dataframe(frame, hide_index=True, use_container_width=True)
+
+
+def show_selected_constituents(grid, symbols):
+    # Constituents of the group of the row selected in an AgGrid table
+    selected = grid.selected_rows if grid is not None else None
+    if not selected:
+        st.caption("Select a row of the table to see the symbols of its industry group.")
+        return
+    show_constituents(symbols, selected[0]['IndustryGroupName'])
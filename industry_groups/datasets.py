@@ -0,0 +1,35 @@
+"""Cleaned datasets shared by every session of the server process.
+
+Datasets are keyed by the hash of the bytes they come from, so analysts
+uploading the same file cost one parse and one copy in memory. Every session
+gets a reference to the same frame: pages select from it (FilterIndex, iloc,
+boolean masks) and must never modify it in place. The total is bounded by
+INDUSTRY_GROUPS_DATASET_CACHE_MB and the least recently used datasets go first.
+"""
+import os
+
+import streamlit as st
+
+from industry_groups.cache import LRUCache
+from industry_groups.instrumentation import register_cache
+
+# Memory budget of the shared datasets, INDUSTRY_GROUPS_DATASET_CACHE_MB overrides it
+DATASET_CACHE_BYTES = int(os.environ.get("INDUSTRY_GROUPS_DATASET_CACHE_MB", "1024")) * 1024 * 1024
+
+
+def frame_memory(df):
+    # Bytes held by the frame, including the strings behind object columns
+    return int(df.memory_usage(deep=True, index=True).sum())
+
+
+@st.cache_resource
+def dataset_cache():
+    # One cache per server process, its counters are shown in the Performance panel
+    cache = LRUCache(DATASET_CACHE_BYTES)
+    register_cache("datasets", cache)
+    return cache
+
+
+def shared_frame(key, create):
+    """The frame cached under `key`, created once by `create()` however many sessions ask at the same time."""
+    return dataset_cache().get_or_create(key, create, frame_memory)
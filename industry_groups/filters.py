@@ -0,0 +1,205 @@
+import numpy as np
+import pandas as pd
+from industry_groups.datasets import dataset_cache
+from industry_groups.instrumentation import span
+
+
+class FilterIndex:
+    """Market cap and industry group lookups over a frame that is never rescanned.
+
+    Rows are presorted by MarketCapital so a range is two binary searches, and
+    IndustryGroupName is kept as category codes so a group selection is one
+    boolean lookup per remaining row. The index keeps no reference to the frame,
+    which has its own dataset cache entry: `query` is given it, and the frame
+    must not be modified while it is indexed.
+    """
+
+    def __init__(self, df):
+        self.size = len(df)
+
+        with span("filter_index"):
+            # NaN sorts last and is left out of every market cap range
+            market_cap = df['MarketCapital'].to_numpy(dtype=float)
+            self.order = np.argsort(market_cap, kind='stable')
+            self.sorted_market_cap = market_cap[self.order]
+            self.valid_rows = int(np.count_nonzero(~np.isnan(market_cap)))
+
+            groups = pd.Categorical(df['IndustryGroupName'])
+            self.codes = groups.codes
+            self.categories = groups.categories
+
+    def memory(self):
+        # The frame is charged to its own dataset cache entry and not held here, only the index arrays count
+        return (self.order.nbytes + self.sorted_market_cap.nbytes + self.codes.nbytes
+                + self.categories.memory_usage(deep=True))
+
+    def market_cap_bounds(self):
+        if self.valid_rows == 0:
+            return 0.0, 0.0
+        return float(self.sorted_market_cap[0]), float(self.sorted_market_cap[self.valid_rows - 1])
+
+    def market_cap_rows(self, min_market_cap=None, max_market_cap=None):
+        # Positions of the rows inside the range, in their original order
+        if min_market_cap is None and max_market_cap is None:
+            return np.arange(self.size)
+        with span("filter"):
+            valid = self.sorted_market_cap[:self.valid_rows]
+            start = 0 if min_market_cap is None else np.searchsorted(valid, min_market_cap, side='left')
+            stop = self.valid_rows if max_market_cap is None else np.searchsorted(valid, max_market_cap, side='right')
+            return np.sort(self.order[start:stop])
+
+    def group_lookup(self, groups):
+        # One flag per category, the extra last slot catches the -1 code of missing names
+        lookup = np.zeros(len(self.categories) + 1, dtype=bool)
+        positions = self.categories.get_indexer(list(groups))
+        lookup[positions[positions >= 0]] = True
+        return lookup
+
+    def groups_in(self, rows):
+        # Group names present in `rows`, in order of appearance
+        codes = pd.unique(self.codes[rows])
+        return self.categories[codes[codes >= 0]]
+
+    def select(self, rows, groups=None):
+        if groups is not None:
+            with span("filter"):
+                rows = rows[self.group_lookup(groups)[self.codes[rows]]]
+        return rows
+
+    def query(self, df, min_market_cap=None, max_market_cap=None, groups=None):
+        """Rows of the indexed frame `df` within the market cap range that belong to `groups` (all when None)."""
+        return df.iloc[self.select(self.market_cap_rows(min_market_cap, max_market_cap), groups)]
+
+
+def block_positions(starts, stops):
+    # Concatenated np.arange(start, stop) of every block, gathered without a Python loop
+    lengths = np.maximum(stops - starts, 0)
+    return np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(lengths.sum())
+
+
+class HistoryIndex:
+    """The compacted history sorted by (Date, IndustryGroupName), queried by binary search.
+
+    Rows of a date range are one contiguous slice. The rows of every date, and of
+    every (group, date) pair, are also kept ordered by market cap under an integer
+    key (block * rows + market cap rank), so any set of blocks cut to a market cap
+    range is two vectorized binary searches. Queries cost time in the rows they
+    return, not in the size of the history; the frame must not be modified.
+    """
+
+    def __init__(self, df):
+        with span("history_index"):
+            dates = pd.Categorical(df['Date'])
+            groups = pd.Categorical(df['IndustryGroupName'])
+            order = np.lexsort((groups.codes, dates.codes))
+
+            self.df = df.iloc[order].reset_index(drop=True)
+            self.dates = pd.DatetimeIndex(dates.categories)
+            self.categories = groups.categories
+            self.date_codes = dates.codes[order]
+            self.codes = groups.codes[order]
+            self.market_cap = self.df['MarketCapital'].to_numpy(dtype=float)
+            self.size = len(self.df)
+
+            # Market caps in ascending order, NaN last, and the rank of every row in that order
+            by_market_cap = np.argsort(self.market_cap, kind='stable')
+            self.sorted_market_cap = self.market_cap[by_market_cap]
+            self.valid_rows = int(np.count_nonzero(~np.isnan(self.market_cap)))
+            ranks = np.empty(self.size, dtype=np.int64)
+            ranks[by_market_cap] = np.arange(self.size)
+
+            # First row of every date, the rows of every date by market cap, and of every (group, date) pair
+            self.date_bounds = np.searchsorted(self.date_codes, np.arange(len(self.dates) + 1))
+            # The keys are unique, so a single argsort of each orders the rows
+            date_keys = self.date_codes.astype(np.int64) * self.size + ranks
+            self.by_date = np.argsort(date_keys)
+            self.date_keys = date_keys[self.by_date]
+            group_keys = (self.codes.astype(np.int64) * len(self.dates) + self.date_codes) * self.size + ranks
+            self.by_group = np.argsort(group_keys)
+            self.group_keys = group_keys[self.by_group]
+
+    def date_span(self, start=None, end=None):
+        # Codes of the first date in the range and of the date after the last one
+        first = 0 if start is None else int(self.dates.searchsorted(pd.Timestamp(start), side='left'))
+        stop = len(self.dates) if end is None else int(self.dates.searchsorted(pd.Timestamp(end), side='right'))
+        return first, max(first, stop)
+
+    def between(self, start=None, end=None):
+        # Frame of a date range, a slice of the sorted history
+        first, stop = self.date_span(start, end)
+        return self.df.iloc[self.date_bounds[first]:self.date_bounds[stop]]
+
+    def group_blocks(self, groups, first, stop):
+        # Block numbers of the (group, date) pairs of `groups` on the date codes first to stop
+        codes = np.unique(self.categories.get_indexer(list(groups)))
+        return (codes[codes >= 0, None].astype(np.int64) * len(self.dates) + np.arange(first, stop)).ravel()
+
+    def block_rows(self, order, keys, blocks, low, high):
+        # Rows of `order` in every block whose market cap rank is within low to high, in row order
+        starts = keys.searchsorted(blocks * self.size + low)
+        stops = keys.searchsorted(blocks * self.size + high)
+        return np.sort(order[block_positions(starts, stops)])
+
+    def rows(self, start=None, end=None, groups=None):
+        """Row positions, in (Date, IndustryGroupName) order, within the dates and of `groups` (all when None)."""
+        first, stop = self.date_span(start, end)
+        if groups is None:
+            return np.arange(self.date_bounds[first], self.date_bounds[stop])
+
+        with span("filter"):
+            return self.block_rows(self.by_group, self.group_keys, self.group_blocks(groups, first, stop),
+                                   0, self.size)
+
+    def within(self, rows, start=None, end=None):
+        # Rows of `rows` on the dates between start and end; `rows` are in date order, so two binary searches
+        first, stop = self.date_span(start, end)
+        low, high = np.searchsorted(self.date_codes[rows], [first, stop])
+        return rows[low:high]
+
+    def market_cap_bounds(self, start=None, end=None):
+        # Lowest and highest market cap within the dates, from the ends of every date's market cap order
+        first, stop = self.date_span(start, end)
+        blocks = np.arange(first, stop, dtype=np.int64) * self.size
+        lowest = self.date_keys.searchsorted(blocks)
+        highest = self.date_keys.searchsorted(blocks + self.valid_rows) - 1
+        valid = highest >= lowest
+        if not valid.any():
+            return 0.0, 0.0
+        return (float(self.sorted_market_cap[(self.date_keys[lowest[valid]] % self.size).min()]),
+                float(self.sorted_market_cap[(self.date_keys[highest[valid]] % self.size).max()]))
+
+    def market_cap_rows(self, start=None, end=None, min_market_cap=None, max_market_cap=None, groups=None):
+        """Row positions, in (Date, IndustryGroupName) order, within the dates and market caps and of `groups`.
+
+        All groups are taken when `groups` is None. The range is turned into market
+        cap ranks once, each date (or group and date) is then two binary searches.
+        NaN is never inside a range; without one this is `rows`.
+        """
+        if min_market_cap is None and max_market_cap is None:
+            return self.rows(start, end, groups)
+
+        first, stop = self.date_span(start, end)
+        with span("filter"):
+            low = 0 if min_market_cap is None else self.sorted_market_cap.searchsorted(min_market_cap, side='left')
+            high = (self.valid_rows if max_market_cap is None
+                    else self.sorted_market_cap[:self.valid_rows].searchsorted(max_market_cap, side='right'))
+            if groups is None:
+                return self.block_rows(self.by_date, self.date_keys, np.arange(first, stop, dtype=np.int64), low, high)
+            return self.block_rows(self.by_group, self.group_keys, self.group_blocks(groups, first, stop), low, high)
+
+    def groups_in(self, rows):
+        # Group names present in `rows`, in order of appearance
+        codes = pd.unique(self.codes[rows])
+        return self.categories[codes[codes >= 0]]
+
+    def snapshot_rows(self, date):
+        # Rows of one snapshot date, empty when it is not in the history
+        position = self.dates.get_indexer([pd.Timestamp(date)])[0]
+        if position < 0:
+            return np.empty(0, dtype=np.int64)
+        return np.arange(self.date_bounds[position], self.date_bounds[position + 1])
+
+
+def filter_index(key, _df):
+    # One index per dataset shared by all sessions, `key` identifies the data behind `_df`
+    return dataset_cache().get_or_create(('index', key), lambda: FilterIndex(_df), FilterIndex.memory)
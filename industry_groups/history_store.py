@@ -0,0 +1,135 @@
+import os
+import shutil
+import tempfile
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+import streamlit as st
+
+from industry_groups.arrow_frames import ARROW_FRAMES, arrow_categories
+from industry_groups.compact import compact_history
+from industry_groups.constituents import symbol_path
+from industry_groups.filters import HistoryIndex
+from industry_groups.ingestion import RANK_COLUMNS
+from industry_groups.instrumentation import span
+
+# Snapshots live next to the app unless INDUSTRY_GROUPS_HISTORY_DIR points elsewhere
+HISTORY_DIR = os.environ.get("INDUSTRY_GROUPS_HISTORY_DIR",
+                             os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "history"))
+
+# Snapshots are partitioned into Date=YYYY-MM-DD directories
+PARTITIONING = ds.partitioning(pa.schema([("Date", pa.date32())]), flavor="hive")
+
+# File holding the rows of one snapshot inside its partition
+SNAPSHOT_FILE = "snapshot.parquet"
+
+# Integer columns are stored as nullable int64 so every partition shares one schema
+INTEGER_COLUMNS = ['NumberOfStocks'] + RANK_COLUMNS
+
+
+class HistoryStore:
+    """Parquet copy of every snapshot ingested so far, one partition per snapshot date."""
+
+    def __init__(self, root=HISTORY_DIR):
+        self.root = root
+
+    def _partition_dir(self, date):
+        return os.path.join(self.root, f"Date={pd.Timestamp(date):%Y-%m-%d}")
+
+    def version(self):
+        # The sorted partition names change whenever a snapshot is added, only complete partitions count
+        if not os.path.isdir(self.root):
+            return ()
+        return tuple(sorted(name for name in os.listdir(self.root) if name.startswith("Date=")
+                            and os.path.isfile(os.path.join(self.root, name, SNAPSHOT_FILE))))
+
+    def dates(self):
+        return [pd.Timestamp(name[len("Date="):]) for name in self.version()]
+
+    def has(self, date):
+        return os.path.isfile(os.path.join(self._partition_dir(date), SNAPSHOT_FILE))
+
+    def append(self, data, symbols=None):
+        """Write every snapshot date in `data` that is not stored yet; returns the dates written.
+
+        `symbols` maps snapshot dates to their SymbolIndex, stored next to the snapshot.
+        """
+        written = []
+        for date, snapshot in data.groupby('Date', sort=True):
+            if self.has(date):
+                continue
+            if symbols is not None and date in symbols:
+                # Written first, so every stored snapshot that was uploaded with symbols has them
+                symbols[date].write(symbol_path(self.root, date))
+
+            table = pa.Table.from_pandas(snapshot.drop(columns=['Date']), preserve_index=False)
+            for column in INTEGER_COLUMNS:
+                if column in table.column_names:
+                    index = table.schema.get_field_index(column)
+                    table = table.set_column(index, column, pc.cast(table.column(column), pa.int64()))
+
+            # The partition is written in a folder pyarrow skips ("_" prefix) and renamed into place whole,
+            # so readers never see a half-written partition
+            os.makedirs(self.root, exist_ok=True)
+            staging_dir = tempfile.mkdtemp(prefix="_staging-", dir=self.root)
+            partition_dir = self._partition_dir(date)
+            try:
+                pq.write_table(table, os.path.join(staging_dir, SNAPSHOT_FILE))
+                if os.path.isdir(partition_dir) and not self.has(date):
+                    # Left behind half-written by an older version of the store
+                    shutil.rmtree(partition_dir)
+                os.replace(staging_dir, partition_dir)
+            except OSError:
+                shutil.rmtree(staging_dir, ignore_errors=True)
+                if not self.has(date):
+                    raise
+                # Another writer stored the same date first
+                continue
+            written.append(date)
+        return written
+
+    def _dataset(self):
+        return ds.dataset(self.root, format="parquet", partitioning=PARTITIONING)
+
+    def load(self, start=None, end=None):
+        """Read the stored history, pushing the date range down to the partitions.
+
+        The pages filter the history through sorted_history_index, which holds all
+        of it; the date range is for the rollups, which only reread new periods.
+        """
+        if not self.version():
+            return None
+
+        predicates = []
+        if start is not None:
+            predicates.append(ds.field('Date') >= pa.scalar(pd.Timestamp(start).date(), pa.date32()))
+        if end is not None:
+            predicates.append(ds.field('Date') <= pa.scalar(pd.Timestamp(end).date(), pa.date32()))
+
+        expression = None
+        for predicate in predicates:
+            expression = predicate if expression is None else expression & predicate
+
+        with span("store_load"):
+            data = self._dataset().to_table(filter=expression).to_pandas(date_as_object=False)
+            data['Date'] = data['Date'].astype('datetime64[ns]')
+        return data
+
+
+@st.cache_resource(show_spinner=False, max_entries=2)
+def sorted_history_index(root, version):
+    # Sorted index over the whole compacted history, built once whenever snapshots are added; with ARROW_FRAMES
+    # its group names are Arrow strings so history_table shares the frame
+    history = compact_history(HistoryStore(root).load())
+    return HistoryIndex(arrow_categories(history) if ARROW_FRAMES else history)
+
+
+@st.cache_resource(show_spinner=False, max_entries=2)
+def history_table(root, version):
+    # Arrow table of the indexed history, its row positions are those of sorted_history_index; with ARROW_FRAMES
+    # it is built from the buffers of the frame without copying
+    df = sorted_history_index(root, version).df
+    return pa.Table.from_pandas(df, preserve_index=False).replace_schema_metadata(None)
@@ -0,0 +1,369 @@
+import hashlib
+import io
+import os
+import tempfile
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from industry_groups.constituents import SYMBOL_COLUMNS, build_symbol_index
+from industry_groups.datasets import dataset_cache, shared_frame
+from industry_groups.instrumentation import span
+from industry_groups.jobs import ingest_jobs, wait_for
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+except ImportError:
+    pa = None
+
+# pandas parser engine of parse_snapshot, "pyarrow" switches to the multithreaded Arrow reader; uploads over
+# STREAMING_THRESHOLD_BYTES are read in chunks by the C engine whatever this says
+CSV_ENGINE = "c"
+
+# Columns every page drops right after reading a snapshot
+DROPPED_COLUMNS = ['Sno', 'Symbol', 'IndustryGroupRankLast6MonthAgo', 'PricePercentChangeYTD']
+
+# Rank columns the pages compare against each other
+RANK_COLUMNS = ['IndustryGroupRankCurrent', 'IndustryGroupRankLastWeek', 'IndustryGroupRankLast3MonthAgo']
+
+# Thousands separators and the crore suffix in values like "1,234.5 Cr"
+MARKET_CAP_NOISE = r',| Cr'
+
+# Session state key under which the name and digest of the last uploaded snapshot are kept for the other pages
+SESSION_KEY = "uploaded_snapshot"
+
+# Folder holding one file per distinct upload for the whole server, INDUSTRY_GROUPS_UPLOAD_DIR overrides it
+UPLOAD_DIR = os.environ.get("INDUSTRY_GROUPS_UPLOAD_DIR",
+                            os.path.join(tempfile.gettempdir(), "industry_groups_uploads"))
+
+# Uploads larger than this are streamed in chunks, INDUSTRY_GROUPS_STREAMING_MB overrides it
+STREAMING_THRESHOLD_BYTES = int(float(os.environ.get("INDUSTRY_GROUPS_STREAMING_MB", "64")) * 2 ** 20)
+
+# Rows parsed at a time by the streaming reader
+CHUNK_ROWS = 50000
+
+
+def file_digest(data):
+    # Hash the raw bytes so the same file always maps to the same cache entry
+    return hashlib.sha256(data).hexdigest()
+
+
+def open_snapshot(data):
+    # Binary file object over the raw bytes or the path of a snapshot
+    return open(data, 'rb') if isinstance(data, (str, os.PathLike)) else io.BytesIO(data)
+
+
+def snapshot_size(data):
+    # Size in bytes of the raw bytes or the file at the path of a snapshot
+    return os.path.getsize(data) if isinstance(data, (str, os.PathLike)) else len(data)
+
+
+def upload_path(digest):
+    return os.path.join(UPLOAD_DIR, f"{digest}.csv")
+
+
+def store_upload(digest, data):
+    """Write an upload to UPLOAD_DIR once per distinct content and return its path.
+
+    Sessions keep only the digest, every page reads the snapshot back from this
+    file, so each upload is held once per server instead of once per session.
+    """
+    path = upload_path(digest)
+    if not os.path.exists(path):
+        os.makedirs(UPLOAD_DIR, exist_ok=True)
+        # Written next to its final name and renamed, readers never see a partial file
+        with tempfile.NamedTemporaryFile(dir=UPLOAD_DIR, suffix=".part", delete=False) as file:
+            file.write(data)
+        os.replace(file.name, path)
+    return path
+
+
+def snapshot_date(file_name):
+    # Snapshots are named after their date, e.g. 31-12-2023.csv
+    return pd.to_datetime(os.path.splitext(os.path.basename(file_name))[0], format='%d-%m-%Y')
+
+
+def decode_market_cap(values):
+    # Strip "," and " Cr" in one vectorized pass and convert to float
+    if pd.api.types.is_numeric_dtype(values):
+        return values.astype(float)
+
+    if pa is not None:
+        try:
+            decoded = pc.cast(pc.replace_substring_regex(pa.array(values, type=pa.string(), from_pandas=True),
+                                                         MARKET_CAP_NOISE, ''), pa.float64())
+            return pd.Series(decoded.to_numpy(zero_copy_only=False), index=values.index, name=values.name)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            # Junk values such as "-" are coerced to NaN by the slower path below
+            pass
+
+    return pd.to_numeric(values.astype(str).str.replace(',', '', regex=False).str.replace(' Cr', '', regex=False),
+                         errors='coerce')
+
+
+def clean_snapshot(df):
+    # Dropping columns
+    df = df.drop(columns=DROPPED_COLUMNS, errors='ignore')
+
+    # Convert 'MarketCapital' column to float and the rank columns to numbers
+    df['MarketCapital'] = decode_market_cap(df['MarketCapital'])
+    for column in RANK_COLUMNS:
+        if column in df.columns:
+            df[column] = pd.to_numeric(df[column], errors='coerce')
+    return df
+
+
+def kept_columns(source, keep=()):
+    # Header of the snapshot without the dropped columns apart from `keep`, so those are never parsed
+    header = pd.read_csv(source, nrows=0).columns
+    return [column for column in header if column not in DROPPED_COLUMNS or column in keep]
+
+
+def parse_snapshot(data, engine=None, with_symbols=False):
+    """Parse the raw bytes, path or binary file object of a snapshot into the cleaned frame every page works on.
+
+    The dropped columns are never materialised and the rank columns are read as
+    float64 straight away, so blank ranks become NaN in the same pass; columns of
+    whole numbers only are then cast to int64. Only non-numeric junk in a rank
+    column falls back to the lenient read followed by a coercing conversion. With
+    `with_symbols` the symbol columns are read too and (frame, SymbolIndex) is
+    returned.
+    """
+    if isinstance(data, (bytes, str, os.PathLike)):
+        with open_snapshot(data) as source:
+            return parse_snapshot(source, engine, with_symbols)
+
+    engine = engine or CSV_ENGINE
+    source = data
+    start = source.tell()
+    usecols = kept_columns(source, SYMBOL_COLUMNS if with_symbols else ())
+    source.seek(start)
+    options = {'usecols': usecols, 'engine': engine}
+    if engine != "pyarrow":
+        options['index_col'] = False
+
+    rank_dtypes = {column: 'float64' for column in RANK_COLUMNS if column in usecols}
+    with span("read_csv"):
+        try:
+            df = pd.read_csv(source, dtype={**rank_dtypes, 'MarketCapital': str}, **options)
+        except ValueError:
+            # A rank that is not a number at all, clean_snapshot coerces it to NaN
+            source.seek(start)
+            df = pd.read_csv(source, dtype={'MarketCapital': str}, **options)
+        else:
+            # Columns of whole numbers only are cast back, NaN and fractions keep a column float64
+            integers = {}
+            for column in rank_dtypes:
+                ranks = df[column].to_numpy()
+                with np.errstate(invalid='ignore'):
+                    values = ranks.astype('int64')
+                if np.array_equal(values, ranks):
+                    integers[column] = 'int64'
+            df = df.astype(integers, copy=False)
+
+    with span("clean"):
+        cleaned = clean_snapshot(df)
+    if not with_symbols:
+        return cleaned
+    return cleaned, build_symbol_index(df.assign(MarketCapital=cleaned['MarketCapital']))
+
+
+def stream_snapshot(source, min_market_cap=None, chunk_rows=CHUNK_ROWS, on_progress=None, with_symbols=False):
+    """Parse a snapshot `chunk_rows` rows at a time, keeping only rows at or above `min_market_cap`.
+
+    `source` is a path or a binary file object. Each chunk is cleaned and filtered
+    before the next one is read, so peak memory is one chunk plus the rows kept.
+    `on_progress(rows_read, rows_kept)` is called after every chunk. With
+    `with_symbols` (frame, SymbolIndex of the rows kept) is returned.
+    """
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, 'rb') as file:
+            return stream_snapshot(file, min_market_cap, chunk_rows, on_progress, with_symbols)
+
+    start = source.tell()
+    usecols = kept_columns(source, SYMBOL_COLUMNS if with_symbols else ())
+    source.seek(start)
+
+    kept = []
+    symbol_rows = []
+    rows_read = rows_kept = 0
+    reader = pd.read_csv(source, usecols=usecols, dtype={'MarketCapital': str}, index_col=False,
+                         chunksize=chunk_rows)
+    with reader:
+        while True:
+            # Reading and cleaning are timed apart, chunk by chunk, like the read_csv and clean of parse_snapshot
+            with span("read_csv"):
+                chunk = next(reader, None)
+            if chunk is None:
+                break
+            rows_read += len(chunk)
+            with span("clean"):
+                cleaned = clean_snapshot(chunk)
+                if min_market_cap is not None:
+                    keep = cleaned['MarketCapital'].to_numpy() >= min_market_cap
+                    chunk, cleaned = chunk[keep], cleaned[keep]
+            rows_kept += len(cleaned)
+            kept.append(cleaned)
+            if with_symbols:
+                symbol_rows.append(chunk.assign(MarketCapital=cleaned['MarketCapital']))
+            if on_progress is not None:
+                on_progress(rows_read, rows_kept)
+
+    if not kept:
+        empty = pd.read_csv(io.StringIO(",".join(usecols)), dtype={'MarketCapital': str})
+        kept, symbol_rows = [clean_snapshot(empty)], [empty]
+    df = pd.concat(kept, ignore_index=True)
+    df.attrs['rows_read'] = rows_read
+    if not with_symbols:
+        return df
+    return df, build_symbol_index(pd.concat(symbol_rows, ignore_index=True))
+
+
+def shared_snapshot(digest, data, job=None):
+    # Parsed once per distinct content for the whole server, the frame is shared and read-only
+    def parse():
+        with open_snapshot(data) as source:
+            if job is not None:
+                job.follow(source)
+            if snapshot_size(data) > STREAMING_THRESHOLD_BYTES:
+                df, symbols = stream_snapshot(source, on_progress=None if job is None else job.progress,
+                                              with_symbols=True)
+            else:
+                # Smaller files take the one-pass reader, a job follows its progress by the bytes read
+                df, symbols = parse_snapshot(source, with_symbols=True)
+                if job is not None:
+                    job.progress(len(df), len(df))
+        dataset_cache().put(('symbols', digest), symbols, symbols.memory())
+        return df
+
+    return shared_frame(('snapshot', digest), parse)
+
+
+def snapshot_job(name, data, digest=None):
+    """Background job parsing an uploaded snapshot into the dataset cache, None when it is cached already.
+
+    Cached snapshots are never queued behind other uploads on the pool. Jobs are
+    keyed by the digest of `data`, so a rerun with the same file attaches to the
+    running job. `digest` saves hashing `data` again when the caller has it and is
+    required when `data` is the path of a stored upload.
+    """
+    digest = digest or file_digest(data)
+    if ('snapshot', digest) in dataset_cache():
+        return None
+    return ingest_jobs().submit(('snapshot', digest), name, snapshot_size(data),
+                                lambda job: shared_snapshot(digest, data, job))
+
+
+def shared_symbols(digest, data):
+    # Symbols are indexed while the snapshot is parsed, the file is only read again if they were evicted
+    return dataset_cache().get_or_create(('symbols', digest), lambda: parse_snapshot(data, with_symbols=True)[1],
+                                         lambda symbols: symbols.memory())
+
+
+def read_snapshot(data):
+    """Parse and clean the raw bytes of a snapshot, once per distinct file content."""
+    return shared_snapshot(file_digest(data), data)
+
+
+def snapshot_jobs(files):
+    # One background job per uploaded file that is not cached (None for the cached ones), all on the shared pool
+    return [snapshot_job(file.name, file.getvalue()) for file in files]
+
+
+def read_snapshot_files(files, jobs=None):
+    """Parse every uploaded snapshot and tag it with the date from its file name.
+
+    Each file is cached on its own under the hash of its bytes, so adding one day
+    to a long upload list only parses that day. Files not cached yet are parsed by
+    background jobs (`jobs` when they were started earlier) while the page shows
+    their progress, cached files are read straight from the cache. The shared
+    frames are left untouched, every returned frame is a tagged copy.
+    """
+    jobs = jobs if jobs is not None else snapshot_jobs(files)
+    parsed = iter(wait_for([job for job in jobs if job is not None]))
+    frames = [read_snapshot(file.getvalue()) if job is None else next(parsed) for file, job in zip(files, jobs)]
+    return [frame.assign(Date=snapshot_date(file.name)) for file, frame in zip(files, frames)]
+
+
+def read_snapshot_symbols(files):
+    """SymbolIndex of every uploaded snapshot by the date in its file name, indexed when the file was parsed."""
+    return {snapshot_date(file.name): shared_symbols(file_digest(file.getvalue()), file.getvalue()) for file in files}
+
+
+def load_uploaded_snapshot(uploaded_file):
+    """Return the cleaned snapshot for this page.
+
+    A new upload replaces the shared snapshot; without one, the file uploaded on
+    any other page is reused so analysts can move between pages freely. The bytes
+    go to UPLOAD_DIR and the session keeps only the name and digest. Uploads over
+    STREAMING_THRESHOLD_BYTES are streamed instead of parsed in one go.
+    """
+    if uploaded_file is not None:
+        data = uploaded_file.getvalue()
+        digest = file_digest(data)
+        current = st.session_state.get(SESSION_KEY)
+        if current is None or current["digest"] != digest:
+            store_upload(digest, data)
+            st.session_state[SESSION_KEY] = {"name": uploaded_file.name, "digest": digest, "size": len(data)}
+
+    snapshot = st.session_state.get(SESSION_KEY)
+    if snapshot is None:
+        return None
+    path = upload_path(snapshot["digest"])
+    if not os.path.exists(path):
+        # The stored file was cleared from under the session, the snapshot has to be uploaded again
+        del st.session_state[SESSION_KEY]
+        return None
+
+    if uploaded_file is None:
+        st.caption(f"Using {snapshot['name']} uploaded earlier.")
+    if snapshot["size"] > STREAMING_THRESHOLD_BYTES:
+        return _stream_uploaded_snapshot(snapshot, path)
+    with span("load_snapshot"):
+        job = snapshot_job(snapshot["name"], path, snapshot["digest"])
+        return shared_snapshot(snapshot["digest"], path) if job is None else wait_for([job])[0]
+
+
+def _stream_uploaded_snapshot(snapshot, path):
+    # The floor is kept with the upload so every page streams the same rows
+    st.sidebar.header("Large Upload")
+    min_market_cap = st.sidebar.number_input("Skip rows below Market Cap", min_value=0.0,
+                                             value=snapshot.get("min_market_cap", 0.0),
+                                             help="Rows below this market cap are dropped while the file is read.")
+
+    snapshot["min_market_cap"] = min_market_cap
+
+    # The streamed rows are shared through the dataset cache like parsed snapshots, keyed by content and floor
+    key = ('snapshot', uploaded_snapshot_digest())
+    frame = dataset_cache().get(key)
+    if frame is None:
+        def stream(job):
+            with open(path, 'rb') as file:
+                return shared_frame(key, lambda: stream_snapshot(job.follow(file), min_market_cap or None,
+                                                                 on_progress=job.progress))
+
+        job = ingest_jobs().submit(key, snapshot["name"], snapshot["size"], stream)
+        frame = wait_for([job])[0]
+    st.sidebar.caption(f"Kept {len(frame):,} of {frame.attrs.get('rows_read', len(frame)):,} rows")
+    return frame
+
+
+def uploaded_snapshot_digest():
+    # Identity of the snapshot shared between the pages, None before the first upload
+    snapshot = st.session_state.get(SESSION_KEY)
+    if snapshot is None:
+        return None
+    if snapshot["size"] > STREAMING_THRESHOLD_BYTES:
+        # A streamed upload differs with the market cap floor it was read with
+        return f"{snapshot['digest']}@{snapshot['min_market_cap']}"
+    return snapshot["digest"]
+
+
+def uploaded_snapshot_symbols():
+    # SymbolIndex of the snapshot shared between the pages, None before an upload and for streamed uploads
+    snapshot = st.session_state.get(SESSION_KEY)
+    if snapshot is None or snapshot["size"] > STREAMING_THRESHOLD_BYTES:
+        return None
+    return shared_symbols(snapshot["digest"], upload_path(snapshot["digest"]))
@@ -0,0 +1,133 @@
+"""Timing spans and memory probes around the hot paths of every page.
+
+Set INDUSTRY_GROUPS_PROFILE=1 to turn instrumentation on. Each rerun then
+shows a "Performance" panel in the sidebar and appends one JSON line to
+INDUSTRY_GROUPS_PROFILE_LOG (profile.jsonl by default). When it is off,
+`span` hands back a shared no-op context manager and nothing is measured.
+"""
+import contextlib
+import json
+import os
+import threading
+import time
+
+import pandas as pd
+import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+ENABLED = os.environ.get("INDUSTRY_GROUPS_PROFILE", "") not in ("", "0")
+LOG_PATH = os.environ.get("INDUSTRY_GROUPS_PROFILE_LOG", "profile.jsonl")
+
+# Session state key of the profile collected during the current rerun
+SESSION_KEY = "rerun_profile"
+
+_NOOP = contextlib.nullcontext()
+_log_lock = threading.Lock()
+
+# Process-wide caches whose counters are reported with every rerun
+_caches = {}
+
+
+def _rss_bytes():
+    # Resident memory of the server process, read from /proc where available
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        if resource is None:
+            return 0
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class RerunProfile:
+    """Spans recorded while one page script runs."""
+
+    def __init__(self, page):
+        self.page = page
+        self.started = time.time()
+        self.start = time.perf_counter()
+        self.start_rss = _rss_bytes()
+        self.spans = []
+        self._lock = threading.Lock()
+
+    def record(self, name, seconds, rss_delta):
+        # Worker threads attached to the session record into the same profile
+        with self._lock:
+            self.spans.append({'stage': name, 'ms': seconds * 1000, 'rss_delta_mb': rss_delta / 2 ** 20})
+
+
+@contextlib.contextmanager
+def _measure(profile, name):
+    rss = _rss_bytes()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile.record(name, time.perf_counter() - start, _rss_bytes() - rss)
+
+
+def _current_profile():
+    if get_script_run_ctx() is None:
+        return None
+    return st.session_state.get(SESSION_KEY)
+
+
+def span(name):
+    """Context manager timing the enclosed block as stage `name` of the current rerun."""
+    if not ENABLED:
+        return _NOOP
+    profile = _current_profile()
+    if profile is None:
+        return _NOOP
+    return _measure(profile, name)
+
+
+def register_cache(name, cache):
+    # `cache` provides stats() returning a dict of counters
+    _caches[name] = cache
+
+
+def start_rerun(page):
+    # Called at the top of every page script, so the folder watcher runs whichever page is opened first
+    from industry_groups.watcher import start_watcher  # imported here, the watcher's imports use this module
+
+    start_watcher()
+    if ENABLED:
+        st.session_state[SESSION_KEY] = RerunProfile(page)
+
+
+def finish_rerun():
+    """Log the rerun as one JSON line and show its breakdown in the sidebar."""
+    if not ENABLED:
+        return
+    profile = st.session_state.get(SESSION_KEY)
+    if profile is None:
+        return
+
+    total_ms = (time.perf_counter() - profile.start) * 1000
+    record = {
+        'time': profile.started,
+        'session': get_script_run_ctx().session_id,
+        'page': profile.page,
+        'total_ms': total_ms,
+        'rss_mb': _rss_bytes() / 2 ** 20,
+        'rss_delta_mb': (_rss_bytes() - profile.start_rss) / 2 ** 20,
+        'spans': profile.spans,
+        'caches': {name: cache.stats() for name, cache in _caches.items()},
+    }
+    with _log_lock, open(LOG_PATH, 'a', encoding='utf-8') as log:
+        log.write(json.dumps(record) + "\n")
+
+    with st.sidebar.expander("Performance", expanded=False):
+        if profile.spans:
+            breakdown = pd.DataFrame(profile.spans).groupby('stage', sort=False).sum()
+            st.dataframe(breakdown.round(2))
+        st.caption(f"Last rerun: {total_ms:.1f} ms, server memory {record['rss_mb']:.0f} MB")
+        for name, stats in record['caches'].items():
+            st.caption(f"{name.capitalize()} cache: {stats['entries']} entries, {stats['mb']:.1f} of "
+                       f"{stats['max_mb']:.0f} MB, {stats['hits']} hits, {stats['misses']} misses")
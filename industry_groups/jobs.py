@@ -0,0 +1,131 @@
+"""Background ingestion jobs the pages attach to instead of parsing in the script.
+
+Uploads are parsed on a thread pool shared by the server process. Every job is
+registered under a key naming its input, such as the digest of the uploaded
+file, so a rerun of the page or another session given the same file attaches to
+the running job instead of starting it again. While a page waits it shows the
+progress and the rows parsed so far; a widget touched meanwhile interrupts the
+waiting, never the job. Finished jobs leave the registry, their results are
+kept by whoever asked for them (the dataset cache for uploads).
+"""
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import streamlit as st
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+from streamlit.runtime.scriptrunner.script_run_context import SCRIPT_RUN_CONTEXT_ATTR_NAME
+
+# Upper bound on the threads parsing uploaded snapshots at the same time
+MAX_INGEST_WORKERS = min(8, os.cpu_count() or 1)
+
+# Seconds between two progress updates on a waiting page
+PROGRESS_INTERVAL = 0.25
+
+
+class IngestJob:
+    """Progress and result of one background ingestion."""
+
+    def __init__(self, name, total_bytes):
+        self.name = name
+        self.total_bytes = total_bytes
+        self.rows_read = 0
+        self.rows_kept = 0
+        self.future = None
+        self._source = None
+
+    def follow(self, source):
+        # Bytes read are taken from the position of the file object being parsed
+        self._source = source
+        return source
+
+    def progress(self, rows_read, rows_kept):
+        # Same signature as the on_progress callback of stream_snapshot
+        self.rows_read, self.rows_kept = rows_read, rows_kept
+
+    def bytes_read(self):
+        if self.future.done():
+            return self.total_bytes
+        if self._source is None or self._source.closed:
+            return 0
+        return min(self._source.tell(), self.total_bytes)
+
+    def done(self):
+        return self.future.done()
+
+    def result(self):
+        return self.future.result()
+
+
+class JobRegistry:
+    """Running jobs by key, executed on one thread pool."""
+
+    def __init__(self, max_workers=MAX_INGEST_WORKERS):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ingest")
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, key, name, total_bytes, work):
+        """The running job for `key`, or a new one calling `work(job)` in the background."""
+        with self._lock:
+            job = self._jobs.get(key)
+            if job is not None:
+                return job
+            job = IngestJob(name, total_bytes)
+            job.future = self._executor.submit(self._run, work, job, get_script_run_ctx())
+            self._jobs[key] = job
+        job.future.add_done_callback(lambda _: self._finish(key, job))
+        return job
+
+    @staticmethod
+    def _run(work, job, ctx):
+        # The pool thread records into the profile of the session that started the job, then lets go of it
+        thread = threading.current_thread()
+        if ctx is not None:
+            add_script_run_ctx(thread, ctx)
+        try:
+            return work(job)
+        finally:
+            setattr(thread, SCRIPT_RUN_CONTEXT_ATTR_NAME, None)
+
+    def _finish(self, key, job):
+        with self._lock:
+            if self._jobs.get(key) is job:
+                del self._jobs[key]
+
+
+@st.cache_resource
+def ingest_jobs():
+    # One registry per server process, so every session sees the same jobs
+    return JobRegistry()
+
+
+def _progress_text(jobs):
+    bytes_read = sum(job.bytes_read() for job in jobs)
+    total_bytes = sum(job.total_bytes for job in jobs)
+    rows = sum(job.rows_kept for job in jobs)
+    finished = sum(job.done() for job in jobs)
+    name = jobs[0].name if len(jobs) == 1 else f"{finished} of {len(jobs)} files"
+    return (f"Parsing {name}: {bytes_read / 2 ** 20:,.1f} of {total_bytes / 2 ** 20:,.1f} MB, "
+            f"{rows:,} rows so far"), bytes_read / total_bytes if total_bytes else 1.0
+
+
+def settled(jobs, timeout=PROGRESS_INTERVAL):
+    # Whether every job finished within `timeout`, so quick jobs are used without showing any progress
+    return not wait([job.future for job in jobs], timeout=timeout).not_done
+
+
+def wait_for(jobs):
+    """Show the progress of `jobs` until every one finished and return their results in order.
+
+    A widget changed meanwhile stops the script at the next progress update; the
+    jobs carry on and the rerun attaches to them again.
+    """
+    if not settled(jobs):
+        text, fraction = _progress_text(jobs)
+        bar = st.progress(fraction, text=text)
+        while not settled(jobs):
+            text, fraction = _progress_text(jobs)
+            bar.progress(fraction, text=text)
+        bar.empty()
+    return [job.result() for job in jobs]
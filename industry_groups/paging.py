@@ -0,0 +1,114 @@
+"""Sorting, searching and paging of the ranking tables on the server.
+
+Only the rows of the visible page are handed to st.dataframe. AgGrid gets a
+block of 1 + PREFETCH_PAGES pages and pages through them in the browser, so the
+next few pages need no rerun; the server control then moves a whole block at a
+time. The grid's own sorting and filtering are turned off as they would only
+see those rows. The sort order and the search matches of a
+table are computed once over the whole frame and kept in the dataset cache, so
+moving to the next page or changing the page size is a slice of an existing
+position array.
+"""
+import math
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from industry_groups.datasets import dataset_cache
+from industry_groups.instrumentation import span
+from industry_groups.render_cache import show_cached_grid
+
+# Choices of rows per page, the second one is the default
+PAGE_SIZES = [25, 50, 100, 250, 500]
+
+# Column searched by the search box
+SEARCH_COLUMN = 'IndustryGroupName'
+
+# Sort choice keeping the order the page built the table in
+AS_SHOWN = "(as shown)"
+
+# Pages after the visible one that are sent to AgGrid along with it
+PREFETCH_PAGES = 2
+
+
+def table_mode():
+    # Every page offers the full table as before next to the paginated one
+    return st.sidebar.radio("Table", ["Paginated", "All Rows"], index=0,
+                            help="Paginated tables are sorted and searched on the server and only send one page.")
+
+
+def _cached_positions(key, create):
+    return dataset_cache().get_or_create(key, create, lambda positions: positions.nbytes)
+
+
+def sort_positions(key, df, column, ascending):
+    """Row positions of `df` sorted by `column`, missing values last; cached under `key`."""
+    def create():
+        values = df[column].reset_index(drop=True)
+        return values.sort_values(ascending=ascending, kind='stable', na_position='last').index.to_numpy()
+
+    return _cached_positions(('sort',) + key + (column, ascending), create)
+
+
+def search_mask(key, df, text):
+    """Rows of `df` whose industry group name contains `text`, ignoring case; cached under `key`."""
+    def create():
+        names = df[SEARCH_COLUMN]
+        if isinstance(names.dtype, pd.CategoricalDtype):
+            # Match every category once and look the rows up by code
+            matches = names.cat.categories.astype(str).str.contains(text, case=False, regex=False)
+            return np.append(matches, False)[names.cat.codes.to_numpy()]
+        return names.astype(str).str.contains(text, case=False, regex=False).to_numpy(dtype=bool)
+
+    return _cached_positions(('search',) + key + (text,), create)
+
+
+def paged_view(key, df, page_sizes=PAGE_SIZES, prefetch=0):
+    """Show the paging controls for `df` and return (page of `df`, key identifying that page).
+
+    `key` must identify the data behind `df`, as the keys of the render cache do.
+    With `prefetch`, every step of the control is a block of 1 + `prefetch` pages
+    that the caller pages through itself, and the whole block is returned. The
+    page size is the fourth item of the returned key.
+    """
+    controls = st.columns([3, 2, 3, 2, 2])
+    sort_column = controls[0].selectbox("Sort by", [AS_SHOWN] + list(df.columns))
+    descending = controls[1].checkbox("Descending", value=False)
+    search = controls[2].text_input("Search Industry Group") if SEARCH_COLUMN in df.columns else ""
+    page_size = controls[3].selectbox("Rows per page", page_sizes, index=1)
+
+    with span("paging"):
+        if sort_column != AS_SHOWN:
+            positions = sort_positions(key, df, sort_column, not descending)
+        else:
+            positions = np.arange(len(df))[::-1] if descending else np.arange(len(df))
+        if search:
+            positions = positions[search_mask(key, df, search)[positions]]
+
+    block_size = page_size * (1 + prefetch)
+    pages = max(math.ceil(len(positions) / block_size), 1)
+    if prefetch:
+        page = controls[4].number_input("Page block", 1, pages, 1,
+                                        help=f"Each block holds {1 + prefetch} pages, the grid pages through them.")
+    else:
+        page = controls[4].number_input("Page", 1, pages, 1)
+    start = (page - 1) * block_size
+    shown = positions[start:start + block_size]
+    st.caption(f"Rows {start + 1 if len(shown) else 0:,}-{start + len(shown):,} of {len(positions):,}"
+               + (f" matching \"{search}\"" if search else "")
+               + (f", {page_size} per grid page" if prefetch else ""))
+    return df.iloc[shown], (sort_column, descending, search, page_size, page)
+
+
+def show_paged_grid(key, df, gridOptions=None, selectable=False, **options):
+    """Display `df` in AgGrid, a window of pages at a time in the Paginated table mode and whole otherwise.
+
+    Arguments are those of show_cached_grid; returns the AgGrid response.
+    """
+    if table_mode() != "Paginated":
+        return show_cached_grid(key, df, gridOptions, selectable, **options)
+    window, page_key = paged_view(key, df, prefetch=PREFETCH_PAGES)
+    page_size = page_key[3]
+    return show_cached_grid(key + ('paged', page_size), window, gridOptions, selectable, page_size=page_size,
+                            **options)
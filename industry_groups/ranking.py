@@ -0,0 +1,10 @@
+def improving_groups(df):
+    """Industry groups ranked better now than both last week and three months ago."""
+    return df[(df['IndustryGroupRankCurrent'] < df['IndustryGroupRankLastWeek']) &
+              (df['IndustryGroupRankCurrent'] < df['IndustryGroupRankLast3MonthAgo'])]
+
+
+def rank_difference(df):
+    """Industry groups ranked better than last week, with the change in a 'RankDifference' column."""
+    improved = df[df['IndustryGroupRankCurrent'] < df['IndustryGroupRankLastWeek']]
+    return improved.assign(RankDifference=improved['IndustryGroupRankCurrent'] - improved['IndustryGroupRankLastWeek'])
@@ -0,0 +1,116 @@
+import hashlib
+import json
+import os
+
+import pyarrow as pa
+import streamlit as st
+from bokeh.embed import json_item
+from st_aggrid import AgGrid, GridOptionsBuilder
+# Streamlit internals (type_util, column_config_utils, the element protos, HASHLIB_KWARGS, st._main._enqueue) are
+# not a public API, they match the streamlit version pinned in requirements.txt
+from streamlit import type_util
+from streamlit.elements.lib.column_config_utils import INDEX_IDENTIFIER, marshall_column_config
+from streamlit.proto.Arrow_pb2 import Arrow as ArrowProto
+from streamlit.proto.BokehChart_pb2 import BokehChart as BokehChartProto
+from streamlit.util import HASHLIB_KWARGS
+
+from industry_groups.cache import LRUCache
+from industry_groups.instrumentation import span
+
+# Memory budget shared by all cached charts and grids, INDUSTRY_GROUPS_RENDER_CACHE_MB overrides it
+RENDER_CACHE_BYTES = int(os.environ.get("INDUSTRY_GROUPS_RENDER_CACHE_MB", "256")) * 1024 * 1024
+
+
+@st.cache_resource
+def render_cache():
+    # One cache per server process, entries are immutable so sessions can share them
+    return LRUCache(RENDER_CACHE_BYTES)
+
+
+def show_bokeh_json(figure_json, use_container_width=True):
+    # Same element st.bokeh_chart emits, but from an already serialized figure
+    dg = st._main
+    proto = BokehChartProto()
+    proto.figure = figure_json
+    proto.use_container_width = use_container_width
+    proto.element_id = hashlib.md5(dg._get_delta_path_str().encode(), **HASHLIB_KWARGS).hexdigest()
+    dg._enqueue("bokeh_chart", proto)
+
+
+def show_cached_chart(key, build, use_container_width=True):
+    """Display the Bokeh chart for `key`, building and serializing it only on a cache miss.
+
+    `key` must identify the dataset and every filter value the chart depends on;
+    `build` returns the figure.
+    """
+    cache = render_cache()
+    figure_json = cache.get(('chart',) + key)
+    if figure_json is None:
+        with span("build_figure"):
+            figure = build()
+        with span("serialize_figure"):
+            figure_json = json.dumps(json_item(figure))
+        cache.put(('chart',) + key, figure_json, len(figure_json))
+    with span("bokeh_chart"):
+        show_bokeh_json(figure_json, use_container_width)
+
+
+def show_arrow_bytes(data, height=None, hide_index=None, use_container_width=False):
+    # Same element st.dataframe emits, but from an already encoded Arrow IPC stream
+    proto = ArrowProto()
+    proto.data = data
+    proto.use_container_width = use_container_width
+    proto.editing_mode = ArrowProto.EditingMode.READ_ONLY
+    if height:
+        proto.height = height
+    marshall_column_config(proto, {} if hide_index is None else {INDEX_IDENTIFIER: {"hidden": hide_index}})
+    st._main._enqueue("arrow_data_frame", proto)
+
+
+def show_cached_dataframe(key, build, height=None, hide_index=None, use_container_width=False):
+    """Display the frame or Arrow table `build()` returns for `key`, encoding it only on a cache miss.
+
+    `key` must identify the rows and the columns of the table; on a hit neither
+    `build` nor the Arrow encoding runs.
+    """
+    cache = render_cache()
+    data = cache.get(('dataframe',) + key)
+    if data is None:
+        with span("build_table"):
+            table = build()
+        with span("encode_table"):
+            if isinstance(table, pa.Table):
+                data = type_util.pyarrow_table_to_bytes(table)
+            else:
+                data = type_util.data_frame_to_bytes(table)
+        cache.put(('dataframe',) + key, data, len(data))
+    with span("dataframe"):
+        show_arrow_bytes(data, height, hide_index, use_container_width)
+
+
+def show_cached_grid(key, df, gridOptions=None, selectable=False, page_size=None, **options):
+    """Display `df` in AgGrid, reusing the grid options built for `key`.
+
+    AgGrid re-encodes whatever it is given (a JSON string is parsed and dumped
+    again), so the frame is handed over as is and only the options are cached.
+    A `selectable` grid lets one row be selected and returns it in `selected_rows`.
+    With `page_size`, `df` is a window of a larger table: the grid shows it
+    `page_size` rows at a time and does not sort or filter it.
+    """
+    cache = render_cache()
+    grid_options = cache.get(('grid',) + key)
+    if grid_options is None:
+        grid_options = gridOptions or GridOptionsBuilder.from_dataframe(df).build()
+        if selectable:
+            grid_options = dict(grid_options, rowSelection='single')
+        if page_size:
+            # Sorting and filtering are done on the server, the grid would only see the rows of the window
+            unsorted = {'sortable': False, 'filter': False}
+            grid_options = dict(grid_options, pagination=True, paginationPageSize=page_size, enableFilter=False,
+                                defaultColDef=dict(grid_options.get('defaultColDef', {}), **unsorted),
+                                columnDefs=[dict(column, **unsorted) for column in grid_options['columnDefs']])
+        cache.put(('grid',) + key, grid_options, len(json.dumps(grid_options, default=str)))
+
+    # AgGrid adds keys such as domLayout to the options it is given
+    with span("aggrid"):
+        return AgGrid(data=df, gridOptions=dict(grid_options), **options)
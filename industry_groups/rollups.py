@@ -0,0 +1,121 @@
+"""Weekly and monthly rollups of every industry group, materialized next to the history.
+
+Each grain is one Parquet file in the _rollups folder of the history store
+(pyarrow skips folders starting with "_" when it reads the snapshots). The dates
+a rollup covers are kept in its schema metadata, so when snapshots are added only
+the periods they fall in are read back and recomputed.
+"""
+import json
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import streamlit as st
+
+from industry_groups.compact import compact_history
+from industry_groups.history_store import HistoryStore
+from industry_groups.instrumentation import span
+
+# Folder of the materialized rollups inside the history store
+ROLLUP_DIR = "_rollups"
+
+# pandas period of every rollup grain
+GRAINS = {'Weekly': 'W-SUN', 'Monthly': 'M'}
+
+# Columns of a rollup, in display order
+ROLLUP_COLUMNS = ['PeriodStart', 'PeriodEnd', 'IndustryGroupName', 'Snapshots', 'MeanRank', 'MinRank', 'MaxRank',
+                  'RankChange', 'MarketCapital', 'MarketCapChange']
+
+# Schema metadata key listing the snapshot dates a rollup was computed from
+DATES_KEY = b'snapshot_dates'
+
+_update_lock = threading.Lock()
+
+
+def compute_rollup(df, grain):
+    """Rollup of the compacted history `df`, one row per period of `grain` and industry group.
+
+    RankChange and MarketCapChange compare the last snapshot of the period with
+    the first one, so a negative RankChange is an improvement like RankDecrease.
+    """
+    freq = GRAINS[grain]
+    with span("rollup"):
+        dates = pd.DatetimeIndex(np.asarray(df['Date'], dtype='datetime64[ns]'))
+        frame = pd.DataFrame({
+            'PeriodStart': dates.to_period(freq).start_time,
+            'IndustryGroupName': df['IndustryGroupName'].array,
+            'Date': dates,
+            'Rank': pd.to_numeric(df['IndustryGroupRankCurrent']).to_numpy(dtype='float32', na_value=np.nan),
+            'MarketCapital': df['MarketCapital'].to_numpy(),
+        }).sort_values('Date', kind='stable')
+
+        grouped = frame.groupby(['PeriodStart', 'IndustryGroupName'], observed=True, sort=True)
+        rollup = grouped.agg(Snapshots=('Date', 'size'), MeanRank=('Rank', 'mean'), MinRank=('Rank', 'min'),
+                             MaxRank=('Rank', 'max'), FirstRank=('Rank', 'first'), LastRank=('Rank', 'last'),
+                             FirstMarketCap=('MarketCapital', 'first'),
+                             MarketCapital=('MarketCapital', 'last')).reset_index()
+
+        rollup['PeriodEnd'] = rollup['PeriodStart'].dt.to_period(freq).dt.end_time.dt.normalize()
+        rollup['RankChange'] = rollup['LastRank'] - rollup['FirstRank']
+        rollup['MarketCapChange'] = rollup['MarketCapital'] - rollup['FirstMarketCap']
+        return rollup[ROLLUP_COLUMNS]
+
+
+def rollup_path(root, grain):
+    return os.path.join(root, ROLLUP_DIR, f"{grain.lower()}.parquet")
+
+
+def _read_rollup(path):
+    # The stored rollup and the snapshot dates it covers
+    if not os.path.exists(path):
+        return None, set()
+    table = pq.read_table(path)
+    return table.to_pandas(), set(json.loads(table.schema.metadata.get(DATES_KEY, b'[]')))
+
+
+def _write_rollup(path, rollup, dates):
+    table = pa.Table.from_pandas(rollup, preserve_index=False)
+    table = table.replace_schema_metadata({**(table.schema.metadata or {}), DATES_KEY: json.dumps(sorted(dates))})
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    pq.write_table(table, path + ".tmp")
+    os.replace(path + ".tmp", path)
+
+
+def update_rollup(history, grain):
+    """Bring the materialized `grain` rollup of `history` up to date and return it.
+
+    Only the periods holding snapshots the rollup has not seen yet are recomputed;
+    if a snapshot it covers disappeared from the store, everything is.
+    """
+    path = rollup_path(history.root, grain)
+    stored = {f"{date:%Y-%m-%d}" for date in history.dates()}
+    with _update_lock:
+        rollup, covered = _read_rollup(path)
+        new_dates = stored - covered
+        if rollup is not None and not new_dates and covered == stored:
+            return rollup
+        if not stored:
+            return pd.DataFrame(columns=ROLLUP_COLUMNS)
+
+        if rollup is None or not covered <= stored:
+            rollup = compute_rollup(compact_history(history.load()), grain)
+        else:
+            periods = pd.DatetimeIndex(sorted(new_dates)).to_period(GRAINS[grain])
+            start, end = periods.min().start_time, periods.max().end_time.normalize()
+            fresh = compute_rollup(compact_history(history.load(start, end)), grain)
+            kept = rollup[(rollup['PeriodStart'] < start) | (rollup['PeriodStart'] > end)]
+            rollup = pd.concat([kept, fresh], ignore_index=True).sort_values(['PeriodStart', 'IndustryGroupName'],
+                                                                              ignore_index=True)
+            rollup['IndustryGroupName'] = rollup['IndustryGroupName'].astype('category')
+
+        _write_rollup(path, rollup, stored)
+    return rollup
+
+
+@st.cache_data(show_spinner=False, max_entries=8)
+def history_rollup(root, version, grain):
+    # `version` only takes part in the cache key so new snapshots update the rollup
+    return update_rollup(HistoryStore(root), grain)
@@ -0,0 +1,70 @@
+"""Rank and market cap changes of every industry group between any two stored snapshots.
+
+Every snapshot is a contiguous block of the sorted history index, and both
+snapshots are joined on the category codes of IndustryGroupName by scattering
+them into arrays indexed by code, so a new pair costs time in the size of the
+two snapshots only.
+"""
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from industry_groups.history_store import sorted_history_index
+from industry_groups.instrumentation import span
+
+
+class SnapshotDiff:
+    """Pairwise comparisons over the compacted history held by a HistoryIndex."""
+
+    def __init__(self, index):
+        self.index = index
+
+    def _by_code(self, rows, column):
+        # Values of `column` laid out by group code, NaN for groups missing from `rows`
+        values = np.full(len(self.index.categories), np.nan)
+        codes = self.index.codes[rows]
+        known = codes >= 0
+        column_values = pd.to_numeric(self.index.df[column].iloc[rows]).to_numpy(dtype=float, na_value=np.nan)
+        values[codes[known]] = column_values[known]
+        return values
+
+    def compare(self, from_date, to_date):
+        """Groups present on both dates with their ranks, RankDifference and MarketCapChange.
+
+        Columns follow the Current vs. Last Week page: the `to_date` rank is
+        IndustryGroupRankCurrent and the `from_date` rank IndustryGroupRankLastWeek,
+        so a negative RankDifference is an improvement.
+        """
+        with span("compare_snapshots"):
+            before, after = self.index.snapshot_rows(from_date), self.index.snapshot_rows(to_date)
+            rank_before = self._by_code(before, 'IndustryGroupRankCurrent')
+            rank_after = self._by_code(after, 'IndustryGroupRankCurrent')
+            cap_before = self._by_code(before, 'MarketCapital')
+            cap_after = self._by_code(after, 'MarketCapital')
+            stocks = self._by_code(after, 'NumberOfStocks')
+
+            both = np.flatnonzero(~np.isnan(rank_before) & ~np.isnan(rank_after))
+            diff = pd.DataFrame({
+                'IndustryGroupName': np.asarray(self.index.categories)[both],
+                'NumberOfStocks': stocks[both],
+                'RankDifference': rank_after[both] - rank_before[both],
+                'IndustryGroupRankCurrent': rank_after[both],
+                'IndustryGroupRankLastWeek': rank_before[both],
+                'MarketCapital': cap_after[both],
+                'MarketCapChange': cap_after[both] - cap_before[both],
+            })
+            for column in ['NumberOfStocks', 'RankDifference', 'IndustryGroupRankCurrent', 'IndustryGroupRankLastWeek']:
+                diff[column] = diff[column].round().astype('Int64')
+            return diff
+
+
+@st.cache_resource(show_spinner=False, max_entries=2)
+def history_snapshot_diff(root, version):
+    # Shares the sorted index of every stored snapshot
+    return SnapshotDiff(sorted_history_index(root, version))
+
+
+@st.cache_data(show_spinner=False, max_entries=32)
+def compare_history_snapshots(root, version, from_date, to_date):
+    # The most recently compared pairs stay cached
+    return history_snapshot_diff(root, version).compare(from_date, to_date)
@@ -0,0 +1,102 @@
+"""Rank streaks and momentum of every industry group across the stored snapshots.
+
+The history is pivoted once into a dates x groups matrix of current ranks and
+every statistic is a whole-matrix NumPy operation on it, so the cost grows with
+the size of the matrix and not with the number of groups times dates in Python.
+A lower rank is better, so an improvement is a rank that went down.
+"""
+import numpy as np
+import pandas as pd
+import streamlit as st
+from numpy.lib.stride_tricks import sliding_window_view
+
+from industry_groups.history_store import sorted_history_index
+from industry_groups.instrumentation import span
+
+# Snapshots looked back by default for momentum and for the best/worst rank
+MOMENTUM_WINDOW = 4
+EXTREME_WINDOW = 12
+
+# Columns of the streak table, in display order
+STREAK_COLUMNS = ['IndustryGroupName', 'CurrentRank', 'CurrentStreak', 'LongestStreak', 'Momentum', 'BestRank',
+                  'WorstRank', 'Snapshots', 'MarketCapital']
+
+
+def pivot_history(df, column='IndustryGroupRankCurrent'):
+    """Return (matrix, dates, groups) with `column` of every group on every snapshot date.
+
+    `df` is the compacted history, whose Date and IndustryGroupName are categoricals;
+    only the dates and groups present in `df` are kept and cells without a row are NaN.
+    """
+    dates = pd.Categorical(df['Date']).remove_unused_categories()
+    groups = pd.Categorical(df['IndustryGroupName']).remove_unused_categories()
+    matrix = np.full((len(dates.categories), len(groups.categories)), np.nan)
+    values = pd.to_numeric(df[column], errors='coerce').to_numpy(dtype=float, na_value=np.nan)
+    present = (dates.codes >= 0) & (groups.codes >= 0)
+    matrix[dates.codes[present], groups.codes[present]] = values[present]
+    return matrix, dates.categories, groups.categories
+
+
+def improvement_streaks(matrix):
+    # Consecutive improvements ending on every date, a missing rank breaks the streak
+    improved = np.zeros(matrix.shape, dtype=bool)
+    improved[1:] = matrix[1:] < matrix[:-1]
+    count = np.cumsum(improved, axis=0)
+    last_break = np.maximum.accumulate(np.where(improved, 0, count), axis=0)
+    return count - last_break
+
+
+def momentum(matrix, window):
+    # Rank places gained over the last `window` snapshots, NaN without both ranks
+    gained = np.full(matrix.shape, np.nan)
+    if 0 < window < len(matrix):
+        gained[window:] = matrix[:-window] - matrix[window:]
+    return gained
+
+
+def rolling_extremes(matrix, window):
+    """Best (lowest) and worst rank over the trailing `window` snapshots of every date."""
+    padded = np.vstack([np.full((window - 1, matrix.shape[1]), np.nan), matrix])
+    windows = sliding_window_view(padded, window, axis=0)
+    # fmin/fmax skip NaN and leave all-missing windows as NaN without warnings
+    return np.fmin.reduce(windows, axis=-1), np.fmax.reduce(windows, axis=-1)
+
+
+def latest_valid(matrix):
+    # Last non-missing value of every column
+    filled = ~np.isnan(matrix)
+    last = len(matrix) - 1 - np.argmax(filled[::-1], axis=0)
+    values = matrix[last, np.arange(matrix.shape[1])]
+    return np.where(filled.any(axis=0), values, np.nan)
+
+
+def streak_table(df, momentum_window=MOMENTUM_WINDOW, extreme_window=EXTREME_WINDOW):
+    """One row per industry group with its streaks, momentum and best/worst rank up to the latest snapshot."""
+    with span("streaks"):
+        ranks, dates, groups = pivot_history(df)
+        if len(dates) == 0:
+            return pd.DataFrame(columns=STREAK_COLUMNS)
+
+        streaks = improvement_streaks(ranks)
+        best, worst = rolling_extremes(ranks, max(extreme_window, 1))
+        table = pd.DataFrame({
+            'IndustryGroupName': groups,
+            'CurrentRank': ranks[-1],
+            'CurrentStreak': streaks[-1],
+            'LongestStreak': streaks.max(axis=0),
+            'Momentum': momentum(ranks, momentum_window)[-1],
+            'BestRank': best[-1],
+            'WorstRank': worst[-1],
+            'Snapshots': np.count_nonzero(~np.isnan(ranks), axis=0),
+            'MarketCapital': latest_valid(pivot_history(df, 'MarketCapital')[0]),
+        })
+    table.attrs['latest_date'] = dates[-1]
+    return table
+
+
+@st.cache_data(show_spinner=False, max_entries=16)
+def history_streaks(root, version, start=None, end=None, momentum_window=MOMENTUM_WINDOW,
+                    extreme_window=EXTREME_WINDOW):
+    # Recomputed only when snapshots are added or the range or windows change
+    history = sorted_history_index(root, version).between(start, end)
+    return streak_table(history, momentum_window, extreme_window)
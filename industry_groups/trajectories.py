@@ -0,0 +1,87 @@
+"""Rank trajectories of industry groups across the stored snapshots, downsampled for the chart.
+
+The selected rows of the sorted history index are scattered into a groups x
+dates matrix of current ranks. When there are more snapshots than the chart is
+wide in pixels, the dates are split into runs of consecutive snapshots and only
+the lowest and highest rank of every group in every run is kept, in date order
+(min/max bucketing). Peaks and troughs survive, no line gets more points than
+the chart has pixels across, and every run is reduced for all groups at once.
+"""
+import numpy as np
+import pandas as pd
+
+from industry_groups.instrumentation import span
+from industry_groups.streaks import latest_valid
+
+# Width of the trajectory chart in pixels, also the most points a line is drawn with
+TRAJECTORY_WIDTH = 1200
+
+# Lines drawn at most, the groups best ranked on their latest snapshot are kept
+MAX_TRAJECTORIES = 500
+
+# Colors the lines cycle through (Bokeh's Category10)
+LINE_COLORS = ['#1f77b4', '#ff7f0e', '#2ca02c', '#d62728', '#9467bd', '#8c564b', '#e377c2', '#7f7f7f', '#bcbd22',
+               '#17becf']
+
+
+def rank_matrix(index, rows, column='IndustryGroupRankCurrent'):
+    """Return (matrix, dates, groups) with `column` of every group (rows) on every date (columns) among `rows`.
+
+    `rows` are positions in the HistoryIndex `index`; cells without a row are NaN.
+    """
+    rows = rows[index.codes[rows] >= 0]
+    dates, date_positions = np.unique(index.date_codes[rows], return_inverse=True)
+    groups, group_positions = np.unique(index.codes[rows], return_inverse=True)
+    matrix = np.full((len(groups), len(dates)), np.nan)
+    matrix[group_positions, date_positions] = pd.to_numeric(index.df[column].iloc[rows]).to_numpy(
+        dtype=float, na_value=np.nan)
+    return matrix, index.dates[dates], index.categories[groups]
+
+
+def minmax_buckets(matrix, buckets):
+    """Column positions and values of the lowest and highest value of every row in each of `buckets` column runs.
+
+    Both are (rows, 2 x runs) arrays with the positions ascending along each row;
+    a run without any value gives NaN, which breaks the line drawn through them.
+    """
+    rows, columns = matrix.shape
+    size = -(-columns // buckets)
+    runs = -(-columns // size)
+    padded = np.full((rows, runs * size), np.nan)
+    padded[:, :columns] = matrix
+    windows = padded.reshape(rows, runs, size)
+
+    missing = np.isnan(windows)
+    low = np.where(missing, np.inf, windows).argmin(axis=2)
+    high = np.where(missing, -np.inf, windows).argmax(axis=2)
+    starts = np.arange(runs) * size
+    positions = np.stack([np.minimum(low, high) + starts, np.maximum(low, high) + starts], axis=2).reshape(rows, -1)
+    return positions, np.take_along_axis(padded, positions, axis=1)
+
+
+def trajectories(index, rows, width=TRAJECTORY_WIDTH, max_lines=MAX_TRAJECTORIES):
+    """Columnar source of the trajectory chart, one row per group with its xs (ms since epoch) and ys.
+
+    The total number of groups among `rows` is kept in `attrs['groups']`.
+    """
+    with span("trajectories"):
+        matrix, dates, groups = rank_matrix(index, rows)
+        total = len(groups)
+        if total > max_lines:
+            kept = np.sort(np.argsort(latest_valid(matrix.T), kind='stable')[:max_lines])
+            matrix, groups = matrix[kept], groups[kept]
+
+        if matrix.shape[1] > width:
+            positions, ranks = minmax_buckets(matrix, width // 2)
+        else:
+            positions, ranks = np.broadcast_to(np.arange(matrix.shape[1]), matrix.shape), matrix
+        times = (dates.asi8 // 10 ** 6).astype(float)[positions]
+
+        data = pd.DataFrame({
+            'IndustryGroupName': np.asarray(groups, dtype=object),
+            'xs': list(times),
+            'ys': list(ranks),
+            'color': [LINE_COLORS[position % len(LINE_COLORS)] for position in range(len(groups))],
+        })
+    data.attrs['groups'] = total
+    return data
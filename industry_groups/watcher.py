@@ -0,0 +1,165 @@
+"""Ingest new dd-mm-YYYY.csv snapshots dropped into a folder, without uploads.
+
+Set INDUSTRY_GROUPS_WATCH_DIR to the folder to watch. One background thread
+per server, started by whichever page is opened first (start_rerun calls
+start_watcher), polls it every INDUSTRY_GROUPS_WATCH_INTERVAL seconds, parses files
+whose date is not in the history store yet, appends them and warms the caches
+of the default Historical View before asking the sessions following the
+history to rerun. A file is only read once its size and modification time
+stayed the same for a whole interval, so half-copied files are left alone.
+"""
+import logging
+import os
+import threading
+
+import streamlit as st
+from streamlit.runtime import Runtime
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+from industry_groups.history_store import HISTORY_DIR, HistoryStore, sorted_history_index
+from industry_groups.ingestion import parse_snapshot, snapshot_date
+
+WATCH_DIR = os.environ.get("INDUSTRY_GROUPS_WATCH_DIR")
+WATCH_INTERVAL = float(os.environ.get("INDUSTRY_GROUPS_WATCH_INTERVAL", "10"))
+
+LOGGER = logging.getLogger(__name__)
+
+
+class FolderWatcher:
+    """Background thread moving new snapshots from `watch_dir` into the history store."""
+
+    def __init__(self, watch_dir, root=HISTORY_DIR, interval=WATCH_INTERVAL):
+        self.watch_dir = watch_dir
+        self.history = HistoryStore(root)
+        self.interval = interval
+        self.ingested = 0
+        self._seen = {}
+        self._failed = {}
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="snapshot-watcher", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def subscribe(self, session_id):
+        # Sessions showing the history rerun whenever a snapshot is ingested
+        with self._lock:
+            self._subscribers.add(session_id)
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                if self.poll():
+                    self._warm_caches()
+                    self._notify()
+            except Exception:
+                LOGGER.exception("Ingesting snapshots from %s failed", self.watch_dir)
+            self._stop.wait(self.interval)
+
+    def _ready_files(self):
+        # Snapshot files not stored yet that did not change since the previous poll
+        ready = []
+        seen = {}
+        with os.scandir(self.watch_dir) as entries:
+            for entry in entries:
+                if not entry.is_file() or not entry.name.lower().endswith(".csv"):
+                    continue
+                try:
+                    date = snapshot_date(entry.name)
+                except ValueError:
+                    continue
+                if self.history.has(date):
+                    continue
+                stat = entry.stat()
+                seen[entry.path] = (stat.st_size, stat.st_mtime_ns)
+                if self._failed.get(entry.path) == seen[entry.path]:
+                    # Failed before and unchanged since, tried again once it is replaced
+                    continue
+                if self._seen.get(entry.path) == seen[entry.path]:
+                    ready.append((date, entry.path))
+        self._seen = seen
+        self._failed = {path: signature for path, signature in self._failed.items() if seen.get(path) == signature}
+        return sorted(ready)
+
+    def poll(self):
+        """Ingest every ready file once; returns the snapshot dates written.
+
+        A file that cannot be read or stored is logged and skipped until its size
+        or modification time changes, the files after it are ingested as usual.
+        """
+        written = []
+        for date, path in self._ready_files():
+            try:
+                with open(path, 'rb') as file:
+                    snapshot, symbols = parse_snapshot(file.read(), with_symbols=True)
+                snapshot['Date'] = date
+                written += self.history.append(snapshot, {date: symbols})
+            except Exception:
+                LOGGER.exception("Ingesting snapshot %s failed, skipped until it changes", path)
+                self._failed[path] = self._seen[path]
+        self.ingested += len(written)
+        return written
+
+    def _warm_caches(self):
+        # Build the sorted history index every history page opens with, so no page waits for it
+        sorted_history_index(self.history.root, self.history.version())
+
+    def _notify(self):
+        """Ask every subscribed session still connected to rerun.
+
+        Streamlit has no public API for this: Runtime._get_async_objs,
+        Runtime._session_mgr, AppSession._client_state and AppSession.request_rerun
+        are internals of the streamlit version pinned in requirements.txt. They are
+        not thread-safe (request_rerun may replace the session's script runner) and
+        this runs on the watcher thread, so the reruns are handed to the server's
+        event loop like Runtime.stop does.
+        """
+        if not Runtime.exists():
+            return
+        runtime = Runtime.instance()
+        with self._lock:
+            session_ids = list(self._subscribers)
+        runtime._get_async_objs().eventloop.call_soon_threadsafe(self._rerun_sessions, runtime, session_ids)
+
+    def _rerun_sessions(self, runtime, session_ids):
+        # Runs on the event loop thread
+        for session_id in session_ids:
+            session_info = runtime._session_mgr.get_active_session_info(session_id)
+            if session_info is None:
+                with self._lock:
+                    self._subscribers.discard(session_id)
+                continue
+            # Rerun the page the session is on, like a source file change does
+            session = session_info.session
+            session.request_rerun(session._client_state)
+
+
+@st.cache_resource(show_spinner=False)
+def _folder_watcher(watch_dir, root):
+    # One watcher per folder and store for the whole server process
+    return FolderWatcher(watch_dir, root).start()
+
+
+def start_watcher(root=HISTORY_DIR):
+    # The watcher of the server process, None when INDUSTRY_GROUPS_WATCH_DIR is not set
+    if not WATCH_DIR:
+        return None
+    return _folder_watcher(os.path.abspath(WATCH_DIR), root)
+
+
+def follow_history(root=HISTORY_DIR):
+    """Rerun the current session whenever the watcher adds snapshots.
+
+    Returns the watcher, or None when INDUSTRY_GROUPS_WATCH_DIR is not set.
+    """
+    watcher = start_watcher(root)
+    ctx = get_script_run_ctx()
+    if watcher is not None and ctx is not None:
+        watcher.subscribe(ctx.session_id)
+    return watcher
@@ -1,50 +1,90 @@
 import streamlit as st
-import pandas as pd
-from st_aggrid import AgGrid, GridOptionsBuilder, ColumnsAutoSizeMode,AgGridTheme
-from bokeh.plotting import figure, show
-from bokeh.models import ColumnDataSource, ColorBar, HoverTool, Spacer, Legend
-from bokeh.transform import dodge
-from bokeh.models import NumeralTickFormatter
-from bokeh.models import Legend
+from st_aggrid import ColumnsAutoSizeMode
+
+from industry_groups.charts import last_week_chart
+from industry_groups.constituents import history_symbols, show_selected_constituents
+from industry_groups.filters import filter_index
+from industry_groups.history_store import HistoryStore
+from industry_groups.ingestion import (load_uploaded_snapshot, snapshot_date, uploaded_snapshot_digest,
+                                       uploaded_snapshot_symbols)
+from industry_groups.instrumentation import finish_rerun, span, start_rerun
+from industry_groups.paging import show_paged_grid
+from industry_groups.ranking import rank_difference
+from industry_groups.render_cache import show_cached_chart
+from industry_groups.snapshot_diff import compare_history_snapshots
 
 # configuration of the page
 st.set_page_config(layout="wide")
+start_rerun("Current vs. Last Week Ranking")
 
 # Title
 st.title("Industry Group Dashboard")
 
-# Upload CSV file
-uploaded_file = st.file_uploader("Upload a CSV file", type=["csv"])
-
-if uploaded_file is not None:
-    # Read the CSV file into a DataFrame
-    df = pd.read_csv(uploaded_file, index_col=False, skiprows=0)
-
-    # Dropping columns
-    df = df.drop(columns=['Sno', 'Symbol', 'IndustryGroupRankLast6MonthAgo', 'PricePercentChangeYTD'])
-
-    # Remove unwanted characters
-    df['MarketCapital'] = df['MarketCapital'].replace({',': '', ' Cr': ''}, regex=True)
-
-    # Convert 'MarketCapital' column to float
-    df['MarketCapital'] = pd.to_numeric(df['MarketCapital'].str.replace(',', '').str.replace(' Cr', ''),
-                                        errors='coerce')
-
+# Compare the two rank columns of one file or any two snapshots of the history
+compare_option = st.sidebar.radio("Compare", ["Current vs. Last Week", "Two Snapshots"])
+
+if compare_option == "Two Snapshots":
+    df = None
+    history = HistoryStore()
+    version = history.version()
+    snapshots = [f"{date:%d-%m-%Y}" for date in history.dates()]
+    if len(snapshots) >= 2:
+        from_date = snapshot_date(st.sidebar.selectbox("From Snapshot", snapshots, index=len(snapshots) - 2))
+        to_date = snapshot_date(st.sidebar.selectbox("To Snapshot", snapshots, index=len(snapshots) - 1))
+        if from_date == to_date:
+            st.write("Pick two different snapshots to compare.")
+    if len(snapshots) >= 2 and from_date != to_date:
+        pair = compare_history_snapshots(history.root, version, from_date, to_date)
+        symbols = history_symbols(history.root, to_date)
+
+        # Filter data based on market cap on the later date
+        lowest_market_cap = float(pair['MarketCapital'].min()) if len(pair) else 0.0
+        highest_market_cap = float(pair['MarketCapital'].max()) if len(pair) else 0.0
+        min_market_cap = st.sidebar.number_input("Minimum Market Cap", lowest_market_cap, highest_market_cap,
+                                                 lowest_market_cap)
+        improved_only = st.sidebar.checkbox("Only groups that improved", value=True)
+        with span("filter"):
+            keep = pair['MarketCapital'].to_numpy() >= min_market_cap
+            if improved_only:
+                keep &= (pair['RankDifference'] < 0).to_numpy(dtype=bool, na_value=False)
+            filtered_df = pair[keep]
+
+        # Everything the chart and the table depend on apart from the label toggle
+        filter_key = ("Two Snapshots", version, from_date, to_date, min_market_cap, improved_only)
+        pair_labels = {'IndustryGroupRankLastWeek': f"Rank on {from_date:%d-%m-%Y}",
+                       'IndustryGroupRankCurrent': f"Rank on {to_date:%d-%m-%Y}"}
+
+        st.subheader(f"Comparison between {from_date:%d-%m-%Y} & {to_date:%d-%m-%Y}.")
+
+        # Add a checkbox to turn on/off text labels
+        show_labels = st.checkbox("Show Text Labels", value=True)
+
+        # Show the chart, rebuilt only when the filters change
+        show_cached_chart(filter_key + (show_labels,),
+                          lambda: last_week_chart(filtered_df, show_labels, labels=pair_labels))
+    elif len(snapshots) < 2:
+        st.write("At least two snapshots must be stored, upload them on the Historical View page.")
+else:
+    # Upload CSV file
+    uploaded_file = st.file_uploader("Upload a CSV file", type=["csv"])
+
+    df = load_uploaded_snapshot(uploaded_file)
+    symbols = uploaded_snapshot_symbols()
+
+if df is not None:
     # Filter data based on market cap
-    min_market_cap = st.sidebar.number_input("Minimum Market Cap", float(df['MarketCapital'].min()),
-                                             float(df['MarketCapital'].max()), float(df['MarketCapital'].min()))
-    filtered_df = df[df['MarketCapital'] >= min_market_cap]
-
-    # Convert 'IndustryGroupRankCurrent', 'IndustryGroupRankLastWeek', and 'IndustryGroupRankLast3MonthsAgo' columns to numeric
-    filtered_df['IndustryGroupRankCurrent'] = pd.to_numeric(filtered_df['IndustryGroupRankCurrent'], errors='coerce')
-    filtered_df['IndustryGroupRankLastWeek'] = pd.to_numeric(filtered_df['IndustryGroupRankLastWeek'], errors='coerce')
-    # filtered_df['IndustryGroupRankLast3MonthAgo'] = pd.to_numeric(filtered_df['IndustryGroupRankLast3MonthAgo'],errors='coerce')
+    index = filter_index(uploaded_snapshot_digest(), df)
+    lowest_market_cap, highest_market_cap = index.market_cap_bounds()
+    min_market_cap = st.sidebar.number_input("Minimum Market Cap", lowest_market_cap, highest_market_cap,
+                                             lowest_market_cap)
+    filtered_df = index.query(df, min_market_cap)
 
-    # Filter based on the condition
-    filtered_df = filtered_df[(filtered_df['IndustryGroupRankCurrent'] < filtered_df['IndustryGroupRankLastWeek'])]
+    # Keep the groups that improved and calculate the difference between current rank and last week rank
+    with span("ranking"):
+        filtered_df = rank_difference(filtered_df)
 
-    # Calculate the difference between current rank and last week rank
-    filtered_df['RankDifference'] = filtered_df['IndustryGroupRankCurrent'] - filtered_df['IndustryGroupRankLastWeek']
+    # Everything the chart and the table depend on apart from the label toggle
+    filter_key = ("Current vs. Last Week Ranking", uploaded_snapshot_digest(), min_market_cap)
 
     # Create a grouped bar chart using Bokeh
     st.subheader("Comparison between Current Rank & Last Week Rank.")
@@ -52,75 +92,8 @@ if uploaded_file is not None:
     # Add a checkbox to turn on/off text labels
     show_labels = st.checkbox("Show Text Labels", value=True)
 
-    # Calculate the length of industries
-    industries = filtered_df['IndustryGroupName'].tolist()
-
-    # Adjust the width based on the number of industries
-    plot_width = max(len(industries) * 40, 800)  # Minimum width of 800 pixels
-
-    source = ColumnDataSource(filtered_df)
-    industries = source.data['IndustryGroupName'].tolist()
-    current_rank = source.data['IndustryGroupRankCurrent'].tolist()
-    weeks = source.data['IndustryGroupRankLastWeek'].tolist()
-
-    p = figure(x_range=industries, height=400, title="Industry Group Rankings",
-               toolbar_location="above", tools="pan,box_zoom,reset,save", y_range=(0, max(current_rank + weeks) + 5))
-
-    p.vbar(x=dodge('IndustryGroupName', 0, range=p.x_range), top='IndustryGroupRankCurrent', width=0.2,
-           source=source, fill_color="#3377FF", line_color="#3377FF", legend_label="Current Rank")
-
-    p.vbar(x=dodge('IndustryGroupName', -0.2, range=p.x_range), top='IndustryGroupRankLastWeek', width=0.2,
-           source=source, fill_color="#FF5733", line_color="#FF5733", legend_label="Last Week Rank")
-
-    # Add text labels to the bars with smaller font size
-    text_font_size = "8pt"
-
-    # Add text labels to the bars
-    if show_labels:
-        p.text(x=dodge('IndustryGroupName', 0.0, range=p.x_range), y='IndustryGroupRankLast3MonthAgo',
-               text='IndustryGroupRankLast3MonthAgo', text_align='center', text_baseline='bottom',
-               source=source, y_offset=5, text_color="black", text_font_size=text_font_size)
-
-        p.text(x=dodge('IndustryGroupName', -0.2, range=p.x_range), y='IndustryGroupRankLastWeek',
-               text='IndustryGroupRankLastWeek', text_align='center', text_baseline='bottom',
-               source=source, y_offset=-3, text_color="black", text_font_size=text_font_size)
-
-        p.text(x=dodge('IndustryGroupName', 0, range=p.x_range), y='IndustryGroupRankCurrent',
-               text='IndustryGroupRankCurrent', text_align='center', text_baseline='bottom',
-               source=source, y_offset=1, text_color="black", text_font_size=text_font_size)
-
-    p.x_range.range_padding = 0.1
-    p.xgrid.grid_line_color = None
-
-    # Add hover tooltips
-    hover = HoverTool()
-    hover.tooltips = [("Industry Group", "@IndustryGroupName"),
-                      ("Last Week Rank", "@IndustryGroupRankLastWeek"),
-                      ("Current Rank", "@IndustryGroupRankCurrent")]
-
-    p.add_tools(hover)
-
-    # Create a custom legend
-    legend: Legend = Legend(items=[(label, [glyph]) for glyph, label in
-                                   zip(p.renderers, [item.label['value'] for item in p.legend.items])],
-                            location="center")
-    p.add_layout(legend, 'below')
-    p.legend.orientation = "horizontal"
-
-    # Remove the top right legend
-    p.legend[0].visible = True
-
-    # Show the bottom legend
-    p.legend[1].visible = False
-
-    # Format y-axis as integers
-    p.yaxis[0].formatter = NumeralTickFormatter(format="0")
-
-    # Customize chart appearance
-    p.xaxis.major_label_orientation = "vertical"
-
-    # Show the chart
-    st.bokeh_chart(p, use_container_width=True)
+    # Show the chart, rebuilt only when the filters change
+    show_cached_chart(filter_key + (show_labels,), lambda: last_week_chart(filtered_df, show_labels))
 
 # Display filtered DataFrame with the desired column header
 grid_options = {
@@ -177,12 +150,26 @@ grid_options = {
         }
     ]
 }
+if compare_option == "Two Snapshots" and 'filtered_df' in locals():
+    # Same columns with the snapshot dates as headers, plus the market cap change
+    grid_options = dict(grid_options, columnDefs=[
+        dict(column, headerName=pair_labels.get(column["field"], column["headerName"]))
+        for column in grid_options["columnDefs"] if column["field"] != "IndustryGroupRankLast3MonthAgo"
+    ] + [{"headerName": "Market Cap Change", "field": "MarketCapChange", "sortable": True}])
+
 if 'filtered_df' in locals():
     st.subheader("Filtered Data")
-    AgGrid(data=filtered_df, gridOptions=grid_options,columns_auto_size_mode=ColumnsAutoSizeMode.FIT_CONTENTS)
+    # Only a few pages are sent, with the columns and headers above
+    grid = show_paged_grid(filter_key, filtered_df, gridOptions=grid_options, selectable=True,
+                           columns_auto_size_mode=ColumnsAutoSizeMode.FIT_CONTENTS)
+
+    # Symbols of the industry group selected in the table, on the later snapshot when two are compared
+    show_selected_constituents(grid, symbols)
 #grid = AgGrid(
 #    data=filtered_df,
 #    gridOptions=grid_options,  # Apply sorting to columns
 #    columns_auto_size_mode=ColumnsAutoSizeMode.FIT_CONTENTS
 #)
 
+# Record how long this rerun took
+finish_rerun()
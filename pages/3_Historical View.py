@@ -1,46 +1,46 @@
+import numpy as np
 import pandas as pd
-import os
+import pyarrow.compute as pc
 import streamlit as st
-from st_aggrid import AgGrid, GridOptionsBuilder, ColumnsAutoSizeMode
+
+from industry_groups.arrow_frames import ARROW_FRAMES, rows_key, take_rows
+from industry_groups.charts import rank_trajectory_chart
+from industry_groups.compact import frame_memory
+from industry_groups.constituents import history_symbols, show_constituents
+from industry_groups.datasets import shared_frame
+from industry_groups.history_store import HistoryStore, history_table, sorted_history_index
+from industry_groups.ingestion import read_snapshot_files, read_snapshot_symbols, snapshot_date, snapshot_jobs
+from industry_groups.instrumentation import finish_rerun, span, start_rerun
+from industry_groups.jobs import settled
+from industry_groups.paging import paged_view, table_mode
+from industry_groups.render_cache import show_cached_chart, show_cached_dataframe
+from industry_groups.rollups import GRAINS, history_rollup
+from industry_groups.trajectories import MAX_TRAJECTORIES, TRAJECTORY_WIDTH, trajectories
+from industry_groups.watcher import follow_history
 
 # Configuration of the page
 st.set_page_config(layout="wide")
+start_rerun("Historical View")
 
 # Step 1: Create a Streamlit app
 st.title("Historical View of Industry Groups")
 
 # Create a grouped bar chart using Bokeh
-st.subheader("Here you can upload multiple CSV files.")
+st.subheader("Here you can upload multiple CSV files. Uploaded snapshots are kept for later sessions.")
 
 # Step 2: File uploader
 uploaded_files = st.file_uploader("Upload CSV files", accept_multiple_files=True, type=["csv"])
 
+# Snapshots dropped into the watched folder are ingested in the background and rerun this page
+watcher = follow_history()
+if watcher is not None:
+    st.caption(f"New snapshots in {watcher.watch_dir} are added automatically.")
 
-# Define a function to process CSV files
-@st.cache_data
-def process_csv_files(files):
-    all_data = []
-    for file in files:
-        data = pd.read_csv(file, index_col=False, skiprows=0)
-
-        # Dropping columns
-        data = data.drop(columns=['Sno', 'Symbol', 'IndustryGroupRankLast6MonthAgo', 'PricePercentChangeYTD'])
-
-        # Convert 'MarketCapital' column to string if not already
-        if not pd.api.types.is_string_dtype(data['MarketCapital']):
-            data['MarketCapital'] = data['MarketCapital'].astype(str)
-
-        # Remove unwanted characters from 'MarketCapital' column
-        data['MarketCapital'] = data['MarketCapital'].str.replace(',', '').str.replace(' Cr', '')
-
-        # Convert 'MarketCapital' column to float
-        data['MarketCapital'] = pd.to_numeric(data['MarketCapital'], errors='coerce')
 
-        # Extract the file name without extension and use it as the 'Date' column
-        file_name = os.path.splitext(os.path.basename(file.name))[0]
-        data['Date'] = pd.to_datetime(file_name, format='%d-%m-%Y')  # Extract date as datetime object
-
-        all_data.append(data)
+# Define a function to process CSV files
+def process_csv_files(files, jobs=None):
+    # Files are cached one by one, so only files not seen before get parsed
+    all_data = read_snapshot_files(files, jobs)
 
     # Concatenate the data from uploaded files
     if all_data:
@@ -50,24 +50,46 @@ def process_csv_files(files):
         return None
 
 
-# Call the function to process CSV files
-industry_data = process_csv_files(uploaded_files)
+def store_new_files():
+    new_data = process_csv_files(new_files, new_jobs)
+    with span("store_append"):
+        history.append(new_data, read_snapshot_symbols(new_files))
+
+
+# Only snapshots whose date is not in the history store yet get parsed, in the background
+history = HistoryStore()
+new_files = [file for file in uploaded_files if not history.has(snapshot_date(file.name))]
+new_jobs = snapshot_jobs(new_files)
+if new_files and settled([job for job in new_jobs if job is not None]):
+    store_new_files()
+    new_files = []
 
 # Sidebar for filter options
 st.sidebar.header("Filter Options")
 
-# Step 3: Filter data based on market cap
-if industry_data is not None:
+# Step 3: Filter data based on date range and market cap
+version = history.version()
+if version:
+    dates = history.dates()
+    date_range = st.sidebar.date_input("Date Range", (dates[0], dates[-1]), dates[0], dates[-1])
+    start_date = date_range[0] if date_range else None
+    end_date = date_range[1] if len(date_range) > 1 else start_date
+
+    # The history is sorted by date and group once, a date range is then a binary search
+    history_index = sorted_history_index(history.root, version)
+    rows = history_index.rows(start_date, end_date)
+    st.sidebar.caption(f"History in memory: {frame_memory(history_index.df) / 2 ** 20:.1f} MB "
+                       f"({history_index.df.attrs['memory_before'] / 2 ** 20:.1f} MB before compaction)")
+
     # Allow user to choose the market cap range
-    min_market_cap = st.sidebar.number_input("Minimum Market Cap", float(industry_data['MarketCapital'].min()),
-                                             float(industry_data['MarketCapital'].max()),
-                                             float(industry_data['MarketCapital'].min()))
+    lowest_market_cap, highest_market_cap = history_index.market_cap_bounds(start_date, end_date)
+    min_market_cap = st.sidebar.number_input("Minimum Market Cap", float(lowest_market_cap),
+                                             float(highest_market_cap), float(lowest_market_cap))
     max_market_cap = st.sidebar.number_input("Maximum Market Cap", float(min_market_cap),
-                                             float(industry_data['MarketCapital'].max()),
-                                             float(industry_data['MarketCapital'].max()))
-
-    industry_data = industry_data[(industry_data['MarketCapital'] >= min_market_cap) &
-                                  (industry_data['MarketCapital'] <= max_market_cap)]
+                                             float(highest_market_cap), float(highest_market_cap))
+    rows = history_index.market_cap_rows(start_date, end_date, min_market_cap, max_market_cap)
+else:
+    history_index = None
 
 # Step 4: Radio button for choosing display option
 display_option = st.sidebar.radio("Display Option", ["Use Multiselect", "Show All Data"], index=0)
@@ -76,59 +98,128 @@ display_option = st.sidebar.radio("Display Option", ["Use Multiselect", "Show Al
 if display_option == "Show All Data":
     st.sidebar.warning("Warning: Loading all data may take time and can slow down the app.")
 
+# Raw snapshots or one of the rollups kept up to date with the store
+view_option = st.sidebar.radio("View", ["Raw Data"] + [f"{grain} Rollup" for grain in GRAINS], index=0)
+
 # Filter data based on the display option
-if industry_data is not None:
+if history_index is not None:
     if display_option == "Use Multiselect":
-        selected_groups = st.multiselect("Select Industry Groups", industry_data['IndustryGroupName'].unique())
-        filtered_data = industry_data[industry_data['IndustryGroupName'].isin(selected_groups)]
-    else:
-        filtered_data = industry_data
+        selected_groups = st.multiselect("Select Industry Groups", history_index.groups_in(rows))
+        # Two binary searches per selected group and date instead of a scan of the date range
+        rows = history_index.market_cap_rows(start_date, end_date, min_market_cap, max_market_cap,
+                                             selected_groups)
 else:
-    filtered_data = None
+    rows = None
 
-# Calculate the 'RankDecrease' column
-if filtered_data is not None:
-    filtered_data['IndustryGroupRankCurrent'] = pd.to_numeric(filtered_data['IndustryGroupRankCurrent'],
-                                                              errors='coerce')
-    filtered_data['IndustryGroupRankLastWeek'] = pd.to_numeric(filtered_data['IndustryGroupRankLastWeek'],
-                                                               errors='coerce')
+# Reorder columns as desired
+column_order = [
+    'IndustryGroupName',
+    'NumberOfStocks',
+    'RankDecrease',
+    'IndustryGroupRankCurrent',
+    'IndustryGroupRankLastWeek',
+    'IndustryGroupRankLast3MonthAgo',
+    'MarketCapital',
+    'Date'
+]
+
+# Rename the columns
+column_names = {
+    'IndustryGroupRankCurrent': 'CurrentRank',
+    'IndustryGroupRankLastWeek': 'LastWeekRank',
+    'IndustryGroupRankLast3MonthAgo': '3MonthAgo'
+}
+
+
+def raw_data_frame(rows):
+    # Rows come from the index in date order, reversed they are newest first without sorting
+    filtered_data = history_index.df.iloc[rows[::-1]]
 
     # Calculate RankDecrease
-    filtered_data['RankDecrease'] = filtered_data['IndustryGroupRankCurrent'] - filtered_data[
-        'IndustryGroupRankLastWeek']
-
-# Reorder columns as desired
-    column_order = [
-        'IndustryGroupName',
-        'NumberOfStocks',
-        'RankDecrease',
-        'IndustryGroupRankCurrent',
-        'IndustryGroupRankLastWeek',
-        'IndustryGroupRankLast3MonthAgo',
-        'MarketCapital',
-        'Date'
-    ]
-
-    filtered_data = filtered_data[column_order]
-
-    # Rename the columns
-    filtered_data = filtered_data.rename(columns={
-        'IndustryGroupRankCurrent': 'CurrentRank',
-        'IndustryGroupRankLastWeek': 'LastWeekRank',
-        'IndustryGroupRankLast3MonthAgo': '3MonthAgo'
-    })
-    
-    # Sort the DataFrame by the "Date" column in descending order
-    filtered_data = filtered_data.sort_values(by="Date", ascending=False)
+    filtered_data = filtered_data.assign(RankDecrease=filtered_data['IndustryGroupRankCurrent'] - filtered_data[
+        'IndustryGroupRankLastWeek'])
+    return filtered_data[column_order].rename(columns=column_names)
+
+
+def raw_data_table(rows):
+    # Same table built from the Arrow copy of the history, without going through pandas
+    table = take_rows(history_table(history.root, version), rows[::-1])
+    rank_decrease = pc.subtract(table['IndustryGroupRankCurrent'], table['IndustryGroupRankLastWeek'])
+    table = table.append_column('RankDecrease', rank_decrease).select(column_order)
+    return table.rename_columns([column_names.get(name, name) for name in column_order])
+
+
+def show_trajectories(rows):
+    # Zooming into fewer snapshots fetches them again in full detail, box zoom only magnifies the points sent
+    first, stop = history_index.date_span(start_date, end_date)
+    chart_dates = [f"{date:%d-%m-%Y}" for date in history_index.dates[first:stop]]
+    if len(rows) == 0 or len(chart_dates) < 2:
+        return
+    zoom = st.select_slider("Chart Dates", chart_dates, value=(chart_dates[0], chart_dates[-1]))
+    chart_rows = history_index.within(rows, snapshot_date(zoom[0]), snapshot_date(zoom[1]))
+
+    groups = len(np.unique(history_index.codes[chart_rows]))
+    if groups > MAX_TRAJECTORIES:
+        st.caption(f"Showing the {MAX_TRAJECTORIES:,} groups ranked best on their latest snapshot of {groups:,}.")
+    show_cached_chart(("Trajectories", history.root, version, rows_key(chart_rows)),
+                      lambda: rank_trajectory_chart(trajectories(history_index, chart_rows), TRAJECTORY_WIDTH),
+                      use_container_width=False)
+
+
+# Rollups of the groups left by the filters, for the periods overlapping the date range
+if rows is not None and view_option != "Raw Data":
+    rollup = history_rollup(history.root, version, view_option.split()[0])
+    with span("filter"):
+        mask = rollup['IndustryGroupName'].isin(history_index.groups_in(rows)).to_numpy()
+        if start_date is not None:
+            mask &= (rollup['PeriodEnd'] >= pd.Timestamp(start_date)).to_numpy()
+            mask &= (rollup['PeriodStart'] <= pd.Timestamp(end_date)).to_numpy()
+        rollup = rollup[mask].sort_values(by="PeriodStart", ascending=False, kind='stable')
+
+    with span("dataframe"):
+        st.dataframe(rollup, height=600, hide_index=True)
 
+# Calculate the 'RankDecrease' column
+elif rows is not None:
     # Display the combined data including RankDecrease column
     #grid = AgGrid(
     #    data=filtered_data,
     #    columns_auto_size_mode=ColumnsAutoSizeMode.FIT_ALL_COLUMNS_TO_VIEW
     #)
 
-# Display the combined data including RankDecrease column with paging
-    st.dataframe(filtered_data, height=600)
+# Rank of the selected groups over time, each line downsampled on the server to the width of the chart
+    show_trajectories(rows)
+
+# Display the combined data including RankDecrease column with paging, encoded again only when the rows change
+    view_key = ("Historical View", history.root, version, start_date, end_date, rows_key(rows))
+    if table_mode() == "Paginated":
+        # The whole view is built once per selection and kept on the server, pages are slices of it
+        view = shared_frame(('view',) + view_key, lambda: raw_data_frame(rows))
+        page, page_key = paged_view(view_key, view)
+        show_cached_dataframe(view_key + page_key, lambda: page, height=600)
+    else:
+        show_cached_dataframe(view_key + (ARROW_FRAMES,),
+                              lambda: raw_data_table(rows) if ARROW_FRAMES else raw_data_frame(rows), height=600)
 
 else:
     st.write("No CSV files uploaded.")
+
+# Symbols behind one industry group on one snapshot, read from the store only when a group is picked
+if rows is not None and len(rows):
+    with st.expander("Constituents"):
+        pickers = st.columns(2)
+        group = pickers[0].selectbox("Industry Group", history_index.groups_in(rows), index=None,
+                                     placeholder="Pick a group")
+        first, stop = history_index.date_span(start_date, end_date)
+        snapshots = [f"{date:%d-%m-%Y}" for date in history_index.dates[first:stop][::-1]]
+        snapshot = pickers[1].selectbox("Snapshot", snapshots)
+        if group is not None:
+            show_constituents(history_symbols(history.root, snapshot_date(snapshot)), group)
+
+# Record how long this rerun took
+finish_rerun()
+
+# The stored history is shown while new files are parsed, the page reruns once they are stored
+if new_files:
+    store_new_files()
+    st.rerun()
@@ -0,0 +1,69 @@
+import streamlit as st
+
+from industry_groups.history_store import HistoryStore
+from industry_groups.instrumentation import finish_rerun, span, start_rerun
+from industry_groups.streaks import EXTREME_WINDOW, MOMENTUM_WINDOW, history_streaks
+from industry_groups.watcher import follow_history
+
+# Configuration of the page
+st.set_page_config(layout="wide")
+start_rerun("Rank Streaks")
+
+# Title
+st.title("Rank Streaks and Momentum")
+
+st.subheader("Industry groups improving their rank snapshot after snapshot, from the stored history.")
+
+# Rerun when the folder watcher adds a snapshot
+follow_history()
+
+history = HistoryStore()
+version = history.version()
+streaks = None
+
+if version:
+    # Sidebar for filter options
+    st.sidebar.header("Filter Options")
+    dates = history.dates()
+    date_range = st.sidebar.date_input("Date Range", (dates[0], dates[-1]), dates[0], dates[-1])
+    start_date = date_range[0] if date_range else None
+    end_date = date_range[1] if len(date_range) > 1 else start_date
+
+    momentum_window = st.sidebar.number_input("Momentum over last N snapshots", 1, max(len(dates) - 1, 1),
+                                              min(MOMENTUM_WINDOW, max(len(dates) - 1, 1)))
+    extreme_window = st.sidebar.number_input("Best/Worst Rank over last N snapshots", 1, len(dates),
+                                             min(EXTREME_WINDOW, len(dates)))
+    streaks = history_streaks(history.root, version, start_date, end_date, momentum_window, extreme_window)
+
+if streaks is not None and len(streaks):
+    st.caption(f"Up to the snapshot of {streaks.attrs['latest_date']:%d-%m-%Y}")
+
+    # Narrow down the groups shown
+    min_streak = st.sidebar.slider("Minimum Current Streak", 0, int(streaks['CurrentStreak'].max()), 0)
+    min_market_cap = st.sidebar.number_input("Minimum Market Cap", 0.0, value=0.0)
+    selected_groups = st.multiselect("Select Industry Groups", streaks['IndustryGroupName'])
+
+    with span("filter"):
+        mask = streaks['CurrentStreak'].to_numpy() >= min_streak
+        if min_market_cap > 0:
+            mask &= streaks['MarketCapital'].to_numpy() >= min_market_cap
+        if selected_groups:
+            mask &= streaks['IndustryGroupName'].isin(selected_groups).to_numpy()
+        shown = streaks[mask]
+
+    # Sort by any statistic, longest current streaks first by default
+    columns = list(streaks.columns)
+    sort_column = st.sidebar.selectbox("Sort by", columns, index=columns.index('CurrentStreak'))
+    ascending = st.sidebar.checkbox("Ascending", value=False)
+    with span("sort"):
+        # Ties are broken by the better current rank
+        tie_break = [] if sort_column == 'CurrentRank' else ['CurrentRank']
+        shown = shown.sort_values(by=[sort_column] + tie_break, ascending=[ascending] + [True] * len(tie_break))
+
+    with span("dataframe"):
+        st.dataframe(shown, height=600, hide_index=True)
+else:
+    st.write("No snapshots stored yet, upload them on the Historical View page.")
+
+# Record how long this rerun took
+finish_rerun()